@@ -6,21 +6,35 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+import gzip
+import io
 import json
-import re
-from flask import Flask, render_template, request, jsonify, send_file
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 from werkzeug.utils import secure_filename
-import PyPDF2
-import pandas as pd
+from exporters import EXPORTERS, available_formats, ensure_export, export_bytes, write_export
+from jobs import DEFAULT_PRIORITY, JOB_PRIORITIES, JobStore, JobWorkerPool, new_job_id, parse_priority_weights
+from ocr_backends import create_backend
+from ocr_client import OCRCallStats, OCRClient
+from ocr_cache import OCRCache
+from order_record import Order
+from order_store import EQUALITY_FILTERS, MAX_PAGE_SIZE, OrderStore, decode_cursor
+from page_images import PREPROCESSING_AVAILABLE, DuplicatePageFilter, PagePreprocessor, parse_regions
+from label_parser import parse_label, parse_labels
+from metrics import (
+    HTTP_REQUEST_SECONDS, JOB_SECONDS, JOBS, ORDERS, PAGES, QUEUE_WAIT_SECONDS, REGISTRY, CallbackMetric,
+    JobTimings, timed
+)
+from pdf_document import PDFDocument
+from result_files import OrderLog, iter_orders, load_summary, read_orders, results_json_chunks, write_summary
+from retention import FolderPolicy, RetentionManager, mark_used
+from thai_address import resolve_address
 from datetime import datetime
-import requests
-import base64
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -29,14 +43,6 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'fallback-secret-key')
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-# Get API key from environment variable
-api_key = os.environ.get("TYPHOON_OCR_API_KEY")
-if not api_key:
-    logger.warning("TYPHOON_OCR_API_KEY not found in environment variables")
-    # Don't fail completely, just log warning
-else:
-    logger.info("TYPHOON_OCR_API_KEY found")
-
 # Configuration for different environments
 IS_PRODUCTION = os.environ.get('RAILWAY_ENVIRONMENT') or os.environ.get('FLASK_ENV') == 'production'
 
@@ -44,179 +50,794 @@ if IS_PRODUCTION:
     UPLOAD_FOLDER = '/tmp/uploads'
     RESULTS_FOLDER = '/tmp/results'
     DEBUG_FOLDER = '/tmp/debug'
-    logger.info("Running in production mode")
+    DATA_FOLDER = '/tmp/data'
 else:
     UPLOAD_FOLDER = 'uploads'
     RESULTS_FOLDER = 'results'
     DEBUG_FOLDER = 'debug'
-    logger.info("Running in development mode")
+    DATA_FOLDER = 'data'
 
 ALLOWED_EXTENSIONS = {'pdf'}
 
-# Create directories if they don't exist
-try:
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(RESULTS_FOLDER, exist_ok=True)
-    os.makedirs(DEBUG_FOLDER, exist_ok=True)
-    logger.info(f"Directories created: {UPLOAD_FOLDER}, {RESULTS_FOLDER}, {DEBUG_FOLDER}")
-except Exception as e:
-    logger.error(f"Failed to create directories: {e}")
+# Batch uploads accept PDFs and zip archives of PDFs
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '50'))
+BATCH_MAX_EXTRACTED_BYTES = int(os.environ.get('BATCH_MAX_EXTRACTED_BYTES', str(500 * 1024 * 1024)))
+
+# Chunk size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Maximum number of pages OCR'd concurrently per document
+OCR_MAX_WORKERS = max(1, int(os.environ.get('OCR_MAX_WORKERS', '4')))
+
+# Number of background threads processing queued upload jobs. Their OCR calls share the
+# OCR_MAX_CONCURRENCY slots, so more jobs than slots can run and a small job starts at once.
+JOB_WORKERS = max(1, int(os.environ.get('JOB_WORKERS', '4')))
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join(DATA_FOLDER, 'jobs.db'))
+# Seconds between job store polls while streaming job events
+JOB_STREAM_POLL_INTERVAL = float(os.environ.get('JOB_STREAM_POLL_INTERVAL', '0.5'))
+# Seconds an idle job worker waits before checking the queue again. Uploads wake workers
+# in the same process at once; a separate worker process (worker.py) relies on polling.
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '1.0'))
+# A running job whose worker sent no heartbeat (every quarter of this) for this many seconds
+# lost its worker and is requeued, resuming from its last checkpointed page, until it has
+# been tried JOB_MAX_ATTEMPTS times. Heartbeats don't wait for pages, so slow jobs are safe.
+JOB_STALE_SECONDS = float(os.environ.get('JOB_STALE_SECONDS', '60'))
+JOB_MAX_ATTEMPTS = max(1, int(os.environ.get('JOB_MAX_ATTEMPTS', '3')))
+
+# Run the job workers and retention sweeper inside this process. start.py turns this
+# off for the web server processes and runs them once, in worker.py, instead.
+RUN_BACKGROUND_WORKERS = os.environ.get('RUN_BACKGROUND_WORKERS', 'true').lower() == 'true'
+# Where worker.py publishes its status and metrics for /health and /metrics/worker
+WORKER_STATUS_PATH = os.environ.get('WORKER_STATUS_PATH', os.path.join(DATA_FOLDER, 'worker_status.json'))
+WORKER_METRICS_PATH = os.environ.get('WORKER_METRICS_PATH', os.path.join(DATA_FOLDER, 'worker_metrics.prom'))
+WORKER_STATUS_INTERVAL = float(os.environ.get('WORKER_STATUS_INTERVAL', '5'))
+
+# Indexed store of every extracted order, served by /orders
+ORDERS_DB_PATH = os.environ.get('ORDERS_DB_PATH', os.path.join(DATA_FOLDER, 'orders.db'))
+
+# Shared OCR client: API quota (requests/second, 0 = unlimited), retries and adaptive concurrency bounds
+OCR_RATE_LIMIT = float(os.environ.get('OCR_RATE_LIMIT', '0'))
+OCR_RATE_BURST = float(os.environ.get('OCR_RATE_BURST', '0')) or None
+OCR_MAX_RETRIES = int(os.environ.get('OCR_MAX_RETRIES', '4'))
+OCR_RETRY_BASE_DELAY = float(os.environ.get('OCR_RETRY_BASE_DELAY', '0.5'))
+OCR_RETRY_MAX_DELAY = float(os.environ.get('OCR_RETRY_MAX_DELAY', '30'))
+OCR_MIN_CONCURRENCY = max(1, int(os.environ.get('OCR_MIN_CONCURRENCY', '1')))
+OCR_MAX_CONCURRENCY = max(OCR_MIN_CONCURRENCY, int(os.environ.get('OCR_MAX_CONCURRENCY', str(OCR_MAX_WORKERS * 2))))
+# Slots go to running jobs by weighted fair queuing: weights for the low, normal and high
+# upload priorities, and the most slots any one job may hold (default half of them)
+JOB_PRIORITY_WEIGHTS = parse_priority_weights(os.environ.get('JOB_PRIORITY_WEIGHTS', '1,2,4'))
+OCR_JOB_MAX_IN_FLIGHT = max(1, int(os.environ.get('OCR_JOB_MAX_IN_FLIGHT', str(OCR_MAX_CONCURRENCY // 2))))
+
+# Take orders straight from the PDF's text layer, skipping OCR, when the text yields at
+# least TEXT_LAYER_MIN_FIELDS of the recipient, order ID and shipping date
+TEXT_LAYER_ENABLED = os.environ.get('TEXT_LAYER_ENABLED', 'true').lower() == 'true'
+TEXT_LAYER_MIN_FIELDS = int(os.environ.get('TEXT_LAYER_MIN_FIELDS', '3'))
+TEXT_LAYER_FIELDS = ("recipient_name", "order_id", "shipping_date")
+
+# Extract every label on a page (2-up and 4-up label sheets) rather than only the first;
+# uploads can override it with the multi_label form field
+MULTI_LABEL_PAGES = os.environ.get('MULTI_LABEL_PAGES', 'true').lower() == 'true'
+
+# Pre-OCR page stage: render, crop to label regions, skip blank and repeated pages.
+# "auto" enables it when pypdfium2 and Pillow are installed.
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', 'auto').lower()
+OCR_RENDER_DPI = int(os.environ.get('OCR_RENDER_DPI', '150'))
+OCR_GRAYSCALE = os.environ.get('OCR_GRAYSCALE', 'true').lower() == 'true'
+# Regions as page fractions "left,top,right,bottom", several separated by ";"
+OCR_CROP_REGIONS = parse_regions(os.environ.get('OCR_CROP_REGIONS', ''))
+OCR_SKIP_BLANK_PAGES = os.environ.get('OCR_SKIP_BLANK_PAGES', 'true').lower() == 'true'
+OCR_BLANK_INK_RATIO = float(os.environ.get('OCR_BLANK_INK_RATIO', '0.002'))
+OCR_DEDUP_PAGES = os.environ.get('OCR_DEDUP_PAGES', 'true').lower() == 'true'
+OCR_DEDUP_MAX_DISTANCE = int(os.environ.get('OCR_DEDUP_MAX_DISTANCE', '0'))
+
+# Export formats written when a job finishes; the rest are built on first download
+EXPORT_EAGER_FORMATS = {f.strip() for f in os.environ.get('EXPORT_EAGER_FORMATS', '').split(',') if f.strip()}
+# Download URL keys the frontend already uses
+EXPORT_URL_KEYS = {'xlsx': 'excel'}
+
+# Retention of uploads, results and debug files: age limits, size quotas (LRU eviction)
+# and gzip compaction of old result JSON, enforced by a background thread
+RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS', '600'))
+UPLOAD_RETENTION_HOURS = float(os.environ.get('UPLOAD_RETENTION_HOURS', '24'))
+UPLOAD_MAX_MB = float(os.environ.get('UPLOAD_MAX_MB', '2048'))
+RESULTS_RETENTION_DAYS = float(os.environ.get('RESULTS_RETENTION_DAYS', '7'))
+RESULTS_MAX_MB = float(os.environ.get('RESULTS_MAX_MB', '1024'))
+RESULTS_COMPRESS_AFTER_HOURS = float(os.environ.get('RESULTS_COMPRESS_AFTER_HOURS', '24'))
+DEBUG_RETENTION_DAYS = float(os.environ.get('DEBUG_RETENTION_DAYS', '2'))
+DEBUG_MAX_MB = float(os.environ.get('DEBUG_MAX_MB', '512'))
+# Orders kept for replaying a completed job's event stream
+JOB_ORDERS_RETENTION_HOURS = float(os.environ.get('JOB_ORDERS_RETENTION_HOURS', '24'))
+# Page checkpoints and orders a failed job keeps for a retry to resume from; by
+# default as long as its upload is kept, since it can't be retried after that
+JOB_CHECKPOINT_RETENTION_HOURS = float(os.environ.get('JOB_CHECKPOINT_RETENTION_HOURS', str(UPLOAD_RETENTION_HOURS)))
+
+# Persistent OCR result cache keyed by page content
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_CACHE_PATH = os.environ.get('OCR_CACHE_PATH', os.path.join(DATA_FOLDER, 'ocr_cache.db'))
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '10000'))
+OCR_CACHE_MAX_AGE_DAYS = float(os.environ.get('OCR_CACHE_MAX_AGE_DAYS', '30'))
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def parse_priority(value):
+    """Index in JOB_PRIORITIES of an upload's ``priority`` field (default normal)"""
+    priority = (value or JOB_PRIORITIES[DEFAULT_PRIORITY]).lower()
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f"priority must be one of: {', '.join(JOB_PRIORITIES)}")
+    return JOB_PRIORITIES.index(priority)
+
+def is_zip_file(filename):
+    return filename.lower().endswith('.zip')
+
 def get_pdf_page_count(pdf_path):
     """Get the total number of pages in a PDF"""
+    with PDFDocument(pdf_path) as document:
+        return document.page_count
+
+def extract_shipping_info(text):
+    """Extract shipping information from OCR text"""
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            return len(pdf_reader.pages)
+        return shipping_info_from_label(parse_label(text))
     except Exception as e:
-        logger.error(f"Error reading PDF: {e}")
-        return 1
-
-# Simple mock OCR function for testing
-def mock_ocr_document(pdf_path, page_num=1):
-    """Mock OCR function for testing when typhoon-ocr is not available"""
-    logger.info(f"Mock OCR processing page {page_num} of {pdf_path}")
-    
-    # Return mock data that matches expected format
-    return """
-TikTok Shop
-
-J&T EXPRESS
-
-ถึง ทดสอบ ผู้รับ
-123/45 ม.6 ต.ทดสอบ อ.ทดสอบ จ.ทดสอบ, ทดสอบ, ทดสอบ, 12345
-
-Order ID
-123456789
+        logger.error(f"Error extracting shipping info: {e}")
+        return shipping_info_from_label(None)
 
-Shipping Date:
-11/06/2025 23:59
-"""
+def extract_all_shipping_info(text):
+    """Extract shipping information for every label in OCR text, in the order they appear"""
+    try:
+        return [shipping_info_from_label(label) for label in parse_labels(text)]
+    except Exception as e:
+        logger.error(f"Error extracting shipping info: {e}")
+        return []
 
-def extract_shipping_info(text):
-    """Extract shipping information from OCR text"""
+def shipping_info_from_label(label):
+    """Shipping information from a parsed label, with its address resolved"""
     extracted_data = {
         "recipient_name": "",
         "recipient_address": "",
         "parsed_address": {},
         "order_id": "",
-        "shipping_date": ""
+        "shipping_date": "",
+        "cod": "",
+        "weight": ""
     }
+    if label is None:
+        return extracted_data
     
-    try:
-        # Extract recipient info
-        recipient_pattern = r'ถึง\s+(.+?)\n((?:.+?\n)*?)(?=\(\+\)|COD|Weight|\n\n|Order|$)'
-        recipient_match = re.search(recipient_pattern, text, re.IGNORECASE | re.DOTALL | re.MULTILINE)
-        
-        if recipient_match:
-            extracted_data["recipient_name"] = recipient_match.group(1).strip()
-            raw_address = recipient_match.group(2).strip()
-            raw_address = re.sub(r'\n+', ' ', raw_address)
-            raw_address = re.sub(r'\s+', ' ', raw_address)
-            extracted_data["recipient_address"] = raw_address
-            
-            # Simple address parsing
-            parts = [part.strip() for part in raw_address.split(',') if part.strip()]
-            extracted_data["parsed_address"] = {
-                "full_address": raw_address,
-                "street_address": parts[0] if len(parts) > 0 else "",
-                "district": parts[1] if len(parts) > 1 else "",
-                "province": parts[2] if len(parts) > 2 else "",
-                "postal_code": ""
-            }
+    extracted_data.update(label)
+    if label["recipient_name"]:
+        extracted_data["parsed_address"] = resolve_address(label["recipient_address"])
+    
+    return extracted_data
+
+def ocr_page(document, page_num, task_type="default", use_cache=True, ocr_stats=None, image=None, timings=None,
+             share=None):
+    """OCR a single page of an open PDFDocument, serving repeat pages from the OCR cache
+    
+    ``image`` is the page pre-rendered to PNG; it is what gets OCR'd and cached.
+    Stage durations are added to ``timings`` (a JobTimings) when given, and
+    the OCR call waits for a slot as part of ``share`` (the job's JobShare).
+    """
+    cache_key = None
+    if ocr_cache is not None:
+        try:
+            page_content = image if image is not None else document.page_bytes(page_num)
+            cache_key = OCRCache.make_key(page_content, task_type, ocr_backend.name)
+        except Exception as e:
+            logger.warning(f"Could not hash page {page_num} for OCR cache: {e}")
+    
+    # Bypassing skips the lookup but still refreshes the cached entry
+    if cache_key and use_cache:
+        with timed("ocr_cache", timings):
+            markdown = ocr_cache.get(cache_key)
+        if markdown is not None:
+            logger.info(f"OCR cache hit for page {page_num}")
+            return markdown
+    
+    with timed("ocr", timings):
+        markdown = ocr_client.ocr_page(document, page_num, task_type, stats=ocr_stats, image=image, share=share)
+    
+    if cache_key:
+        ocr_cache.put(cache_key, markdown)
+    
+    return markdown
+
+def orders_from_markdown(markdown, page_num, timings=None, multi_label=True):
+    """Parse a page's OCR output into a list of Order records, each tagged with its page and slot
+    
+    ``slot`` numbers the labels on the page from 1 in reading order. With
+    ``multi_label`` off only the first label is read, as one order at most.
+    """
+    with timed("parse", timings):
+        labels = extract_all_shipping_info(markdown) if multi_label else [extract_shipping_info(markdown)]
+    
+    orders = []
+    for shipping_info in labels:
+        # Only keep labels where we found something relevant
+        if not (shipping_info["order_id"] or shipping_info["recipient_name"]):
+            continue
+        orders.append(Order.from_shipping_info(page_num, len(orders) + 1, shipping_info))
+    return orders
+
+def text_layer_orders(document, page_num, timings=None, multi_label=True):
+    """Parse a page's embedded text layer; returns ``(orders, text)``
+    
+    ``orders`` is None unless every label in the text holds at least
+    TEXT_LAYER_MIN_FIELDS of the label fields, so scanned pages and
+    fonts without a usable text mapping fall back to OCR.
+    """
+    with timed("text_layer", timings):
+        text = document.page_text(page_num)
+    if not text.strip():
+        return None, text
+    
+    orders = orders_from_markdown(text, page_num, timings, multi_label)
+    if not orders or any(sum(1 for field in TEXT_LAYER_FIELDS if getattr(order, field)) < TEXT_LAYER_MIN_FIELDS
+                         for order in orders):
+        return None, text
+    return orders, text
+
+def save_debug_page(document_name, prepared):
+    """Write the image sent to OCR into DEBUG_FOLDER and return its details"""
+    base = os.path.splitext(document_name)[0]
+    image_path = os.path.join(DEBUG_FOLDER, f"{base}_page{prepared.page}.png")
+    with open(image_path, 'wb') as f:
+        f.write(prepared.image_bytes)
+    return dict(prepared.describe(), image=image_path)
+
+def ocr_pdf_pages(pdf_path, max_pages=None, task_type="default", debug_mode=False, max_workers=None,
+                  progress_callback=None, use_cache=True, order_callback=None, completed_pages=None,
+                  page_callback=None, multi_label=None, order_log=None, job_id=None, priority=DEFAULT_PRIORITY):
+    """OCR PDF pages and extract shipping information"""
+    timings = JobTimings()
+    completed_pages = completed_pages or {}
+    if multi_label is None:
+        multi_label = MULTI_LABEL_PAGES
+        
+    # Parse the PDF once and share it across every page worker
+    with PDFDocument(pdf_path) as document:
+        with timed("pdf_open", timings):
+            total_pages = document.page_count
+        pages_to_process = total_pages if max_pages is None else min(max_pages, total_pages)
+        
+        results = {
+            "document": os.path.basename(document.path),
+            "total_pages": total_pages,
+            "processed_pages": pages_to_process,
+            "extracted_orders": [],
+            "processing_status": "success",
+            "failed_pages": [],
+            "skipped_pages": {"blank": [], "duplicate": []},
+            "ocr_stats": None,
+            "debug_pages": [] if debug_mode else None,
+            "timings": None,
+            "resumed_pages": sum(1 for page in completed_pages if page <= pages_to_process),
+            "text_layer_pages": 0
+        }
+        
+        if pages_to_process < 1:
+            return results
+        
+        ocr_stats = OCRCallStats()
+        # OCR calls share the client's slots with other running jobs, weighted by priority
+        share = ocr_client.limiter.open_share(job_id or results["document"], JOB_PRIORITY_WEIGHTS[priority],
+                                              OCR_JOB_MAX_IN_FLIGHT, JOB_PRIORITIES[priority])
+        duplicates = DuplicatePageFilter(OCR_DEDUP_MAX_DISTANCE) if OCR_DEDUP_PAGES else None
+        
+        def run_page(page_num):
+            # Pages an earlier attempt checkpointed are not processed again
+            checkpoint = completed_pages.get(page_num)
+            if checkpoint is not None:
+                PAGES.inc(outcome="resumed")
+                return [Order.from_dict(order) for order in checkpoint["orders"]], None, checkpoint["page_info"]
             
-            # Extract postal code
-            postal_match = re.search(r'\d{5}', raw_address)
-            if postal_match:
-                extracted_data["parsed_address"]["postal_code"] = postal_match.group()
+            logger.info(f"Processing page {page_num}/{pages_to_process}")
+            page_info = {}
+            try:
+                # A text layer that already holds the label is parsed without OCR
+                if TEXT_LAYER_ENABLED:
+                    orders, text = text_layer_orders(document, page_num, timings, multi_label)
+                    if orders is not None:
+                        logger.info(f"Page {page_num} read from its text layer")
+                        page_info["text_layer"] = True
+                        PAGES.inc(outcome="text_layer")
+                        ORDERS.inc(len(orders))
+                        if order_callback:
+                            for order in orders:
+                                order_callback(order.as_dict())
+                        if page_callback:
+                            page_callback(page_num, [order.as_dict() for order in orders], page_info, text)
+                        return orders, None, page_info
+                
+                # Rendered once and sent as a cropped image; blank and repeated pages skip OCR
+                image = None
+                if page_preprocessor is not None:
+                    with timed("render", timings):
+                        prepared = page_preprocessor.prepare(document, page_num)
+                    image = prepared.image_bytes
+                    if debug_mode:
+                        page_info["debug"] = save_debug_page(results["document"], prepared)
+                    if OCR_SKIP_BLANK_PAGES and prepared.blank:
+                        logger.info(f"Skipping blank page {page_num}")
+                        page_info["blank"] = True
+                        PAGES.inc(outcome="blank")
+                        if page_callback:
+                            page_callback(page_num, [], page_info, None)
+                        return [], None, page_info
+                    duplicate_of = duplicates.first_seen(prepared) if duplicates is not None else None
+                    if duplicate_of is not None:
+                        logger.info(f"Skipping page {page_num}, a duplicate of page {duplicate_of}")
+                        page_info["duplicate_of"] = duplicate_of
+                        PAGES.inc(outcome="duplicate")
+                        if page_callback:
+                            page_callback(page_num, [], page_info, None)
+                        return [], None, page_info
+                
+                markdown = ocr_page(document, page_num, task_type, use_cache=use_cache, ocr_stats=ocr_stats,
+                                    image=image, timings=timings, share=share)
+                orders = orders_from_markdown(markdown, page_num, timings, multi_label)
+                PAGES.inc(outcome="ok" if orders else "no_order")
+                ORDERS.inc(len(orders))
+                # Orders are streamed before earlier pages finish, then the page is checkpointed
+                if order_callback:
+                    for order in orders:
+                        order_callback(order.as_dict())
+                if len(orders) > 1:
+                    logger.info(f"Found {len(orders)} labels on page {page_num}")
+                if page_callback:
+                    page_callback(page_num, [order.as_dict() for order in orders], page_info, markdown)
+                return orders, None, page_info
+            except Exception as e:
+                logger.error(f"Error processing page {page_num}: {e}")
+                PAGES.inc(outcome="failed")
+                return [], e, page_info
         
-        # Extract Order ID
-        order_id_match = re.search(r'Order ID\s*:?\s*\n?(\d+)', text, re.IGNORECASE)
-        if order_id_match:
-            extracted_data["order_id"] = order_id_match.group(1).strip()
+        def run_page_in_order(page_num):
+            try:
+                return run_page(page_num)
+            finally:
+                # Whatever path the page took, later pages waiting in the duplicate filter may go on
+                if duplicates is not None:
+                    duplicates.skip(page_num)
         
-        # Extract Shipping Date
-        shipping_date_match = re.search(r'Shipping Date:\s*\n?(.+?)(?:\n|\r|$)', text, re.IGNORECASE)
-        if shipping_date_match:
-            extracted_data["shipping_date"] = shipping_date_match.group(1).strip()
+        workers = min(max_workers or OCR_MAX_WORKERS, pages_to_process)
         
-    except Exception as e:
-        logger.error(f"Error extracting shipping info: {e}")
+        try:
+            # executor.map yields in submission order, so orders stay sorted by page
+            with (timed("pages", timings),
+                  ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-page") as executor):
+                pages = executor.map(run_page_in_order, range(1, pages_to_process + 1))
+                for pages_done, (orders, error, page_info) in enumerate(pages, start=1):
+                    if "debug" in page_info:
+                        results["debug_pages"].append(page_info["debug"])
+                    if page_info.get("text_layer"):
+                        results["text_layer_pages"] += 1
+                    if page_info.get("blank"):
+                        results["skipped_pages"]["blank"].append(pages_done)
+                    elif "duplicate_of" in page_info:
+                        results["skipped_pages"]["duplicate"].append(
+                            {"page": pages_done, "duplicate_of": page_info["duplicate_of"]}
+                        )
+                    
+                    if error is not None:
+                        results["processing_status"] = "partial_success"
+                        results["failed_pages"].append(pages_done)
+                    else:
+                        results["extracted_orders"].extend(orders)
+                        # The order log gets each page's orders in page order
+                        if order_log is not None:
+                            order_log.write(orders)
+                    
+                    if progress_callback:
+                        progress_callback(pages_done, pages_to_process, len(results["extracted_orders"]))
+        
+        finally:
+            ocr_client.limiter.close_share(share)
+        
+        results["ocr_stats"] = ocr_stats.as_dict()
+        if debug_mode:
+            results["timings"] = timings.as_dict()
+        return results
+
+def new_result_name(filename):
+    """Base name shared by every result file of one run, unique even for uploads of the same file"""
+    base_filename = filename.replace('.pdf', '')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"result_{base_filename}_{timestamp}_{new_job_id()[:8]}"
+
+def results_summary(results):
+    """``results`` without its orders, which live in the result files, plus their count"""
+    summary = {key: value for key, value in results.items() if key != "extracted_orders"}
+    summary["orders_found"] = len(results.get("extracted_orders", []))
+    return summary
+
+def save_results(results, filename, result_name=None):
+    """Write the result files and return download URLs for them and every export format
     
-    return extracted_data
+    Orders go to ``<result_name>.jsonl``, one per line, unless a job's
+    OrderLog already wrote them there page by page, and the rest of the
+    results to ``<result_name>.summary.json``. The JSON result download is
+    streamed from those two rather than stored as a second copy of the
+    orders. Exports are built from the orders file on their first download
+    unless listed in EXPORT_EAGER_FORMATS.
+    """
+    result_name = result_name or new_result_name(filename)
+    orders_filename = f"{result_name}.jsonl"
+    orders_path = os.path.join(RESULTS_FOLDER, orders_filename)
+    if not os.path.exists(orders_path):
+        with OrderLog(orders_path) as order_log:
+            order_log.write(results["extracted_orders"])
+    
+    summary = dict(results_summary(results), orders_file=orders_filename)
+    with timed("save_json"):
+        write_summary(os.path.join(RESULTS_FOLDER, f"{result_name}.summary.json"), summary)
+    
+    download_urls = {'json': f'/download/{result_name}.json', 'jsonl': f'/download/{orders_filename}'}
+    for extension in available_formats():
+        export_filename = f"{result_name}.{extension}"
+        if extension in EXPORT_EAGER_FORMATS:
+            write_export(results, os.path.join(RESULTS_FOLDER, export_filename), extension)
+        download_urls[EXPORT_URL_KEYS.get(extension, extension)] = f'/download/{export_filename}'
+    
+    return download_urls
 
-def ocr_pdf_pages(pdf_path, max_pages=None, task_type="default", debug_mode=False):
-    """OCR PDF pages and extract shipping information"""
+def find_results_json(json_path):
+    """Return the path of a results JSON or summary, or its gzipped copy once retention has compressed it"""
+    for path in (json_path, f"{json_path}.gz"):
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_results_json(json_path):
+    opener = gzip.open if json_path.endswith('.gz') else open
+    with opener(json_path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_orders(results, offset=0, limit=None):
+    """Read a page of the orders behind a stored results summary, or None if they are gone
     
-    total_pages = get_pdf_page_count(pdf_path)
-    pages_to_process = total_pages if max_pages is None else min(max_pages, total_pages)
+    Orders come from the JSON Lines file, or from the JSON result file
+    written for results stored before the orders file was the only copy;
+    results stored before orders moved out of the summary carry them inline.
+    """
+    stop = None if limit is None else offset + limit
+    if "extracted_orders" in results:
+        return results["extracted_orders"][offset:stop]
+    orders_file = results.get("orders_file")
+    if not orders_file:
+        return None
+    orders_path = os.path.join(RESULTS_FOLDER, orders_file)
+    if os.path.exists(orders_path):
+        mark_used(orders_path)
+        return read_orders(orders_path, offset, limit)
+    json_path = find_results_json(f"{os.path.splitext(orders_path)[0]}.json")
+    if json_path:
+        return load_results_json(json_path)["extracted_orders"][offset:stop]
+    return None
+
+def orders_response(results):
+    """Summary of stored results plus the page of orders picked by the offset and limit query parameters"""
+    offset = max(0, int(request.args.get('offset', 0)))
+    limit = max(1, min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE))
+    orders = load_orders(results, offset, limit)
+    total = results.get("orders_found", len(results.get("extracted_orders", [])))
+    return {
+        'results': {key: value for key, value in results.items() if key != "extracted_orders"},
+        'orders': orders if orders is not None else [],
+        'orders_total': total,
+        'orders_available': orders is not None,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if orders is not None and offset + limit < total else None
+    }
+
+def queue_seconds(job):
+    """Seconds a job waited for a job worker, so far if it is still queued"""
+    started = datetime.now() if job['state'] == 'queued' else datetime.fromisoformat(job['started_at'])
+    return round((started - datetime.fromisoformat(job['created_at'])).total_seconds(), 3)
+
+def run_upload_job(job):
+    """Process a queued upload job; called from a background job worker"""
+    filepath = job["filepath"]
+    options = job["options"]
     
-    results = {
-        "document": os.path.basename(pdf_path),
-        "total_pages": total_pages,
-        "processed_pages": pages_to_process,
+    def on_progress(pages_done, pages_total, orders_found):
+        job_store.update_progress(job["id"], pages_done, pages_total, orders_found)
+    
+    def on_order(order_data):
+        job_store.add_order(job["id"], order_data)
+    
+    def on_page(page_num, orders, page_info, markdown):
+        job_store.save_page(job["id"], page_num, page_info, orders, markdown)
+    
+    completed_pages = {}
+    if job["attempts"] > 1:
+        # Orders streamed for pages that never reached a checkpoint are about to be redone
+        job_store.discard_unsaved_orders(job["id"])
+        completed_pages = job_store.get_pages(job["id"])
+        logger.info(f"Resuming job {job['id']} (attempt {job['attempts']}): "
+                    f"{len(completed_pages)} page(s) already checkpointed")
+    
+    started = time.perf_counter()
+    QUEUE_WAIT_SECONDS.observe(queue_seconds(job), priority=JOB_PRIORITIES[job["priority"]])
+    state = "failed"
+    result_name = new_result_name(job["filename"])
+    order_log = OrderLog(os.path.join(RESULTS_FOLDER, f"{result_name}.jsonl"))
+    try:
+        results = ocr_pdf_pages(
+            filepath,
+            options.get("max_pages"),
+            debug_mode=options.get("debug_mode", False),
+            progress_callback=on_progress,
+            use_cache=not options.get("bypass_cache", False),
+            order_callback=on_order,
+            completed_pages=completed_pages,
+            page_callback=on_page,
+            multi_label=options.get("multi_label"),
+            order_log=order_log,
+            job_id=job["id"],
+            priority=job["priority"]
+        )
+        order_log.close()
+        # Report the uploaded name rather than the job-prefixed upload path
+        results["document"] = job["filename"]
+        download_urls = save_results(results, job["filename"], result_name)
+        try:
+            order_store.add_orders(job["id"], job["filename"], (order.as_dict() for order in results["extracted_orders"]),
+                                   job.get("batch_id"))
+        except Exception as e:
+            # The result files are already written, so the job still succeeds
+            logger.error(f"Failed to index orders for job {job['id']}: {e}")
+        logger.info(
+            f"Processing completed: {len(results['extracted_orders'])} orders found, "
+            f"{results['text_layer_pages']} page(s) read from the text layer"
+        )
+        state = "completed"
+        return dict(results_summary(results), orders_file=f"{result_name}.jsonl"), download_urls
+    
+    finally:
+        order_log.close()
+        if state == "failed" and os.path.exists(order_log.path):
+            os.remove(order_log.path)
+        JOB_SECONDS.observe(time.perf_counter() - started, state=state)
+        JOBS.inc(state=state)
+        # Clean up uploaded file; a failed job keeps it so it can be retried, until retention removes it
+        if state == "completed" and os.path.exists(filepath):
+            try:
+                os.remove(filepath)
+                logger.info(f"Cleaned up file: {filepath}")
+            except Exception as e:
+                logger.warning(f"Failed to clean up file: {e}")
+
+def merge_batch_results(jobs):
+    """Merge the results of a batch's jobs into one set deduplicated by order ID
+    
+    Each merged order records every document and page it was found on in
+    ``sources``; orders without an order ID can't be matched and are kept
+    as they are.
+    """
+    merged = {
+        "documents": [],
+        "total_pages": 0,
+        "processed_pages": 0,
         "extracted_orders": [],
+        "duplicate_orders": 0,
         "processing_status": "success",
-        "debug_pages": [] if debug_mode else None
+        "ocr_stats": {}
     }
+    orders_by_id = {}
     
-    # Process each page
-    for page_num in range(1, pages_to_process + 1):
-        logger.info(f"Processing page {page_num}/{pages_to_process}")
+    for job in jobs:
+        document = {"job_id": job["id"], "document": job["filename"], "state": job["state"]}
+        merged["documents"].append(document)
         
-        try:
-            # Use mock OCR for now
-            markdown = mock_ocr_document(pdf_path, page_num)
-            shipping_info = extract_shipping_info(markdown)
-            
-            # Only add if we found relevant data
-            if shipping_info["order_id"] or shipping_info["recipient_name"]:
-                order_data = {
-                    "page": page_num,
-                    "recipient_name": shipping_info["recipient_name"],
-                    "recipient_address": shipping_info["recipient_address"],
-                    "parsed_address": shipping_info["parsed_address"],
-                    "order_id": shipping_info["order_id"],
-                    "shipping_date": shipping_info["shipping_date"]
-                }
-                results["extracted_orders"].append(order_data)
+        if job["state"] != "completed":
+            document["error"] = job["error"]
+            merged["processing_status"] = "partial_success"
+            continue
+        
+        results = job["results"]
+        document["total_pages"] = results["total_pages"]
+        document["processed_pages"] = results["processed_pages"]
+        document["orders_found"] = results.get("orders_found", len(results.get("extracted_orders", [])))
+        document["processing_status"] = results["processing_status"]
+        merged["total_pages"] += results["total_pages"]
+        merged["processed_pages"] += results["processed_pages"]
+        if results["processing_status"] != "success":
+            merged["processing_status"] = "partial_success"
+        for name, value in (results.get("ocr_stats") or {}).items():
+            merged["ocr_stats"][name] = merged["ocr_stats"].get(name, 0) + value
+        
+        orders = load_orders(results)
+        if orders is None:
+            document["error"] = "Orders are no longer available"
+            merged["processing_status"] = "partial_success"
+            continue
+        for order in orders:
+            source = {"document": job["filename"], "page": order["page"], "slot": order.get("slot", 1)}
+            existing = orders_by_id.get(order["order_id"]) if order["order_id"] else None
+            if existing is not None:
+                existing["sources"].append(source)
+                merged["duplicate_orders"] += 1
+                continue
             
-        except Exception as e:
-            logger.error(f"Error processing page {page_num}: {e}")
-            results["processing_status"] = "partial_success"
+            merged_order = dict(order, document=job["filename"], sources=[source])
+            merged["extracted_orders"].append(merged_order)
+            if order["order_id"]:
+                orders_by_id[order["order_id"]] = merged_order
     
-    return results
+    return merged
 
-def create_excel_file(results, filename):
-    """Create Excel file from results"""
-    excel_data = []
-    
-    for order in results["extracted_orders"]:
-        row = {
-            'หน้า': order['page'],
-            'Order ID': order['order_id'],
-            'ชื่อผู้รับ': order['recipient_name'],
-            'วันที่จัดส่ง': order['shipping_date'],
-            'ที่อยู่เดิม': order['recipient_address'],
-            'ที่อยู่ละเอียด': order['parsed_address'].get('street_address', ''),
-            'อำเภอ': order['parsed_address'].get('district', ''),
-            'จังหวัด': order['parsed_address'].get('province', ''),
-            'รหัสไปรษณีย์': order['parsed_address'].get('postal_code', '')
-        }
-        excel_data.append(row)
+def finalize_batch(job):
+    """Merge a batch once its last job finishes; called after every job"""
+    batch_id = job.get("batch_id")
+    if not batch_id or not job_store.claim_batch_merge(batch_id):
+        return
     
-    df = pd.DataFrame(excel_data)
-    excel_path = os.path.join(RESULTS_FOLDER, filename)
+    try:
+        merged = merge_batch_results(job_store.get_batch_jobs(batch_id))
+        merged["document"] = f"batch_{batch_id}"
+        result_name = new_result_name(f"batch_{batch_id}")
+        download_urls = save_results(merged, f"batch_{batch_id}", result_name)
+        job_store.complete_batch(batch_id, dict(results_summary(merged), orders_file=f"{result_name}.jsonl"),
+                                 download_urls)
+        logger.info(
+            f"Batch {batch_id} completed: {len(merged['extracted_orders'])} unique orders, "
+            f"{merged['duplicate_orders']} duplicates"
+        )
+    except Exception as e:
+        logger.error(f"Batch {batch_id} merge failed: {e}")
+        job_store.fail_batch(batch_id, e)
+
+def start_background_workers():
+    """Start the job workers and retention sweeper in this process (idempotent)"""
+    job_workers.start()
+    retention.start()
+
+def background_status():
+    """Status of the job workers and retention sweeper running in this process"""
+    return {
+        "pid": os.getpid(),
+        "job_workers": job_workers.num_workers,
+        "ocr_backend": ocr_client.describe(),
+        "storage": retention.stats()
+    }
+
+def read_worker_status():
+    """Return the status last published by worker.py, or None if it never ran"""
+    try:
+        with open(WORKER_STATUS_PATH, encoding='utf-8') as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    age = time.time() - status.get("updated_at", 0)
+    # Missing a few publishes in a row means the worker process is gone or stuck
+    status["alive"] = age < WORKER_STATUS_INTERVAL * 3
+    status["age_seconds"] = round(age, 1)
+    return status
+
+# Services shared by the routes and job workers, created by create_app()
+ocr_backend = None
+ocr_client = None
+page_preprocessor = None
+ocr_cache = None
+job_store = None
+order_store = None
+job_workers = None
+retention = None
+_app_initialized = False
+_app_init_lock = threading.Lock()
+
+def create_app():
+    """Set up logging, folders and services and return the Flask app
     
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='ข้อมูลการจัดส่ง', index=False)
+    This is the server entry point (``gunicorn 'app:create_app()'``).
+    Importing the module only defines routes and reads configuration,
+    and libraries that are slow to import (openpyxl, PyPDF2, requests,
+    Pillow) load when first used, so workers boot and answer /health
+    quickly. Safe to call more than once.
+    """
+    global ocr_backend, ocr_client, page_preprocessor, ocr_cache
+    global job_store, order_store, job_workers, retention, _app_initialized
     
-    return excel_path
+    with _app_init_lock:
+        if _app_initialized:
+            return app
+        
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        logger.info(f"=== APPLICATION STARTUP === PORT={os.environ.get('PORT', 'NOT_SET')}, "
+                    f"cwd={os.getcwd()}, Python {sys.version.split()[0]}")
+        logger.info("Running in production mode" if IS_PRODUCTION else "Running in development mode")
+        if not os.environ.get("TYPHOON_OCR_API_KEY"):
+            # Don't fail completely, just log warning
+            logger.warning("TYPHOON_OCR_API_KEY not found in environment variables")
+        
+        # Create directories if they don't exist
+        try:
+            for folder in (UPLOAD_FOLDER, RESULTS_FOLDER, DEBUG_FOLDER, DATA_FOLDER):
+                os.makedirs(folder, exist_ok=True)
+        except Exception as e:
+            logger.error(f"Failed to create directories: {e}")
+        
+        ocr_backend = create_backend(pool_size=OCR_MAX_CONCURRENCY)
+        ocr_client = OCRClient(
+            ocr_backend,
+            rate_limit=OCR_RATE_LIMIT,
+            burst=OCR_RATE_BURST,
+            max_retries=OCR_MAX_RETRIES,
+            base_delay=OCR_RETRY_BASE_DELAY,
+            max_delay=OCR_RETRY_MAX_DELAY,
+            min_concurrency=OCR_MIN_CONCURRENCY,
+            max_concurrency=OCR_MAX_CONCURRENCY
+        )
+        logger.info(f"Using OCR backend: {ocr_backend.describe()}")
+        
+        if OCR_PREPROCESS == 'true' or (OCR_PREPROCESS == 'auto' and PREPROCESSING_AVAILABLE):
+            page_preprocessor = PagePreprocessor(
+                dpi=OCR_RENDER_DPI,
+                grayscale=OCR_GRAYSCALE,
+                regions=OCR_CROP_REGIONS,
+                blank_ink_ratio=OCR_BLANK_INK_RATIO
+            )
+            logger.info(f"Pre-OCR page stage enabled: {page_preprocessor.describe()}")
+        
+        ocr_cache = OCRCache(
+            OCR_CACHE_PATH,
+            max_entries=OCR_CACHE_MAX_ENTRIES,
+            max_age_seconds=OCR_CACHE_MAX_AGE_DAYS * 24 * 3600
+        ) if OCR_CACHE_ENABLED else None
+        
+        job_store = JobStore(JOBS_DB_PATH)
+        order_store = OrderStore(ORDERS_DB_PATH)
+        job_workers = JobWorkerPool(job_store, run_upload_job, num_workers=JOB_WORKERS,
+                                    poll_interval=JOB_POLL_INTERVAL, on_finished=finalize_batch,
+                                    stale_seconds=JOB_STALE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS)
+        
+        retention = RetentionManager([
+            FolderPolicy('uploads', UPLOAD_FOLDER, max_age_seconds=UPLOAD_RETENTION_HOURS * 3600,
+                         max_bytes=UPLOAD_MAX_MB * 1024 * 1024, protect=job_store.active_filepaths),
+            FolderPolicy('results', RESULTS_FOLDER, max_age_seconds=RESULTS_RETENTION_DAYS * 24 * 3600,
+                         max_bytes=RESULTS_MAX_MB * 1024 * 1024,
+                         compress_after_seconds=RESULTS_COMPRESS_AFTER_HOURS * 3600),
+            FolderPolicy('debug', DEBUG_FOLDER, max_age_seconds=DEBUG_RETENTION_DAYS * 24 * 3600,
+                         max_bytes=DEBUG_MAX_MB * 1024 * 1024)
+        ], interval=RETENTION_INTERVAL_SECONDS, tasks={
+            'job_orders': lambda now: job_store.prune_orders(JOB_ORDERS_RETENTION_HOURS * 3600),
+            'job_checkpoints': lambda now: job_store.prune_failed_checkpoints(JOB_CHECKPOINT_RETENTION_HOURS * 3600)
+        })
+        
+        if RUN_BACKGROUND_WORKERS:
+            start_background_workers()
+        
+        _app_initialized = True
+        return app
+
+# Gauges and lifetime counters read from their owners at scrape time
+CallbackMetric('ocr_jobs_by_state', 'Jobs currently in each state',
+               lambda: {(state,): count for state, count in job_store.count_by_state().items()}, ['state'])
+CallbackMetric('ocr_client_concurrency_limit', 'Current adaptive limit on concurrent OCR calls',
+               lambda: {(): ocr_client.limiter.stats()["limit"]})
+CallbackMetric('ocr_client_in_flight', 'OCR calls in flight',
+               lambda: {(): ocr_client.limiter.stats()["in_flight"]})
+CallbackMetric('ocr_client_queue_depth', 'OCR calls waiting for a slot, by job priority',
+               lambda: {(priority,): depth for priority, depth in ocr_client.limiter.queue_depth().items()},
+               ['priority'])
+CallbackMetric('ocr_client_events', 'OCR client calls, retries, throttling and failed pages',
+               lambda: {(name,): value for name, value in ocr_client.totals.as_dict().items()
+                        if not name.endswith("_wait_seconds")}, ['event'], type='counter')
+CallbackMetric('ocr_client_rate_limit_wait_seconds', 'Time spent waiting for the OCR rate limiter',
+               lambda: {(): ocr_client.totals.as_dict()["rate_limit_wait_seconds"]}, type='counter')
+CallbackMetric('ocr_client_queue_wait_seconds', 'Time OCR calls spent waiting for a concurrency slot',
+               lambda: {(): ocr_client.totals.as_dict()["queue_wait_seconds"]}, type='counter')
+CallbackMetric('ocr_cache_lookups', 'OCR cache lookups, by result',
+               lambda: {(result,): ocr_cache.stats()[result] for result in ("hits", "misses")} if ocr_cache else {},
+               ['result'], type='counter')
 
 # Routes
 @app.route('/')
@@ -224,16 +845,27 @@ def index():
     logger.info("Index page accessed")
     return render_template('index.html')
 
-# Add this near the top after app creation
-@app.before_first_request
-def startup_info():
-    port = os.environ.get('PORT', 'NOT_SET')
-    logger.info(f"=== APPLICATION STARTUP ===")
-    logger.info(f"PORT environment variable: {port}")
-    logger.info(f"Current working directory: {os.getcwd()}")
-    logger.info(f"Python version: {sys.version}")
-    logger.info(f"Flask app: {app}")
-    logger.info(f"App config: {dict(app.config)}")
+@app.before_request
+def ensure_initialized():
+    # Servers pointed at app:app (flask run, older start commands) never call create_app()
+    if not _app_initialized:
+        create_app()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
 
 # Enhance health check
 @app.route('/health')
@@ -254,9 +886,21 @@ def health_check():
                 "upload": UPLOAD_FOLDER,
                 "results": RESULTS_FOLDER,
                 "debug": DEBUG_FOLDER
-            }
+            },
+            "jobs": job_store.count_by_state(),
+            "page_preprocessing": page_preprocessor.describe() if page_preprocessor is not None else {"enabled": False},
+            "ocr_cache": ocr_cache.stats() if ocr_cache is not None else {"enabled": False}
         }
         
+        # OCR runs wherever the job workers do; in production that is the worker.py process
+        if RUN_BACKGROUND_WORKERS:
+            background = dict(background_status(), mode="in_process", alive=True)
+        else:
+            background = dict(read_worker_status() or {"alive": False}, mode="worker_process")
+        health_data["ocr_backend"] = background.pop("ocr_backend", None)
+        health_data["storage"] = background.pop("storage", None)
+        health_data["background_workers"] = background
+        
         # Test directory access
         for name, path in health_data["directories"].items():
             health_data[f"{name}_exists"] = os.path.exists(path)
@@ -272,6 +916,20 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/worker')
+def worker_metrics():
+    """Pipeline metrics last published by the worker.py process"""
+    try:
+        with open(WORKER_METRICS_PATH, encoding='utf-8') as f:
+            return Response(f.read(), mimetype='text/plain; version=0.0.4')
+    except OSError:
+        return jsonify({'error': 'No worker metrics published'}), 404
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     logger.info("Upload request received")
@@ -283,68 +941,461 @@ def upload_file():
         file = request.files['file']
         max_pages = request.form.get('max_pages', type=int)
         debug_mode = request.form.get('debug_mode', 'false').lower() == 'true'
+        bypass_cache = request.form.get('bypass_cache', 'false').lower() == 'true'
+        multi_label = request.form.get('multi_label', str(MULTI_LABEL_PAGES)).lower() == 'true'
+        try:
+            priority = parse_priority(request.form.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            job_id = new_job_id()
+            # Prefix with the job ID so concurrent uploads of the same file don't collide
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+            # Copy the spooled upload to disk in large chunks instead of reading it into memory
+            file.save(filepath, buffer_size=UPLOAD_CHUNK_SIZE)
             
             logger.info(f"File saved: {filepath}")
             
-            # Process the PDF
-            results = ocr_pdf_pages(filepath, max_pages, debug_mode=debug_mode)
-            
-            # Create timestamps and filenames
-            base_filename = filename.replace('.pdf', '')
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            # Save JSON results
-            json_filename = f"result_{base_filename}_{timestamp}.json"
-            json_path = os.path.join(RESULTS_FOLDER, json_filename)
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            
-            # Create Excel file
-            excel_filename = f"result_{base_filename}_{timestamp}.xlsx"
-            excel_path = create_excel_file(results, excel_filename)
-            
-            download_urls = {
-                'json': f'/download/{json_filename}',
-                'excel': f'/download/{excel_filename}'
-            }
-            
-            logger.info(f"Processing completed: {len(results['extracted_orders'])} orders found")
+            job_store.create_job(job_id, filename, filepath, {
+                'max_pages': max_pages,
+                'debug_mode': debug_mode,
+                'bypass_cache': bypass_cache,
+                'multi_label': multi_label
+            }, priority=priority)
+            job_workers.notify()
             
             return jsonify({
                 'success': True,
-                'results': results,
-                'download_urls': download_urls,
-                'debug_mode': debug_mode
-            })
+                'job_id': job_id,
+                'status_url': f'/jobs/{job_id}',
+                'events_url': f'/jobs/{job_id}/events',
+                'debug_mode': debug_mode,
+                'priority': JOB_PRIORITIES[priority]
+            }), 202
             
         return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
         
     except Exception as e:
         logger.error(f"Upload processing error: {e}")
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the state and progress of an upload job"""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
     
-    finally:
-        # Clean up uploaded file
-        if 'filepath' in locals() and os.path.exists(filepath):
-            try:
+    response = {
+        'job_id': job['id'],
+        'state': job['state'],
+        'document': job['filename'],
+        'pages_done': job['pages_done'],
+        'pages_total': job['pages_total'],
+        'orders_found': job['orders_found'],
+        'debug_mode': job['options'].get('debug_mode', False),
+        'attempts': job['attempts'],
+        'priority': JOB_PRIORITIES[job['priority']],
+        'queue_seconds': queue_seconds(job),
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+    
+    if job['state'] == 'completed':
+        try:
+            response.update(orders_response(job['results']))
+        except ValueError:
+            return jsonify({'error': 'offset and limit must be integers'}), 400
+        response['download_urls'] = job['download_urls']
+    elif job['state'] == 'failed':
+        response['error'] = job['error']
+    
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Queue a failed job again, resuming after its last checkpointed page"""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] != 'failed':
+        return jsonify({'error': f"Only failed jobs can be retried; this job is {job['state']}"}), 409
+    if not os.path.exists(job['filepath']):
+        return jsonify({'error': 'The uploaded file is no longer available; upload it again'}), 409
+    if not job_store.retry_job(job_id):
+        return jsonify({'error': 'Job is no longer failed'}), 409
+    
+    job_workers.notify()
+    logger.info(f"Job {job_id} queued for retry")
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}',
+        'events_url': f'/jobs/{job_id}/events'
+    }), 202
+
+def partial_results(job, pages):
+    """Build a results dict from a job's checkpointed pages"""
+    results = {
+        "document": job["filename"],
+        "total_pages": job["pages_total"],
+        "processed_pages": len(pages),
+        "extracted_orders": [],
+        "processing_status": "partial",
+        "failed_pages": [],
+        "skipped_pages": {"blank": [], "duplicate": []},
+        "ocr_stats": None,
+        "debug_pages": None,
+        "timings": None
+    }
+    for page_num in sorted(pages):
+        page_info = pages[page_num]["page_info"]
+        if page_info.get("blank"):
+            results["skipped_pages"]["blank"].append(page_num)
+        elif "duplicate_of" in page_info:
+            results["skipped_pages"]["duplicate"].append({"page": page_num, "duplicate_of": page_info["duplicate_of"]})
+        results["extracted_orders"].extend(pages[page_num]["orders"])
+    return results
+
+@app.route('/jobs/<job_id>/partial')
+def job_partial_export(job_id):
+    """Export the orders of every page a running or failed job has checkpointed so far
+    
+    Without a ``format`` query parameter this returns the progress and a
+    download URL per format; with one it sends that export, built in
+    memory from the checkpoints on each request, so nothing is written to
+    the results folder.
+    """
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] == 'completed':
+        return jsonify({
+            'job_id': job_id,
+            'state': job['state'],
+            'orders_found': job['orders_found'],
+            'download_urls': job['download_urls']
+        })
+    
+    export_format = request.args.get('format')
+    formats = ['json', 'jsonl'] + available_formats()
+    if export_format is not None and export_format not in formats:
+        return jsonify({'error': f"Invalid format: {export_format}", 'formats': formats}), 400
+    
+    pages = job_store.get_pages(job_id)
+    if not pages:
+        return jsonify({'error': 'No pages have been processed yet'}), 409
+    
+    results = partial_results(job, pages)
+    if export_format is None:
+        return jsonify({
+            'job_id': job_id,
+            'state': job['state'],
+            'pages_done': len(pages),
+            'pages_total': job['pages_total'],
+            'orders_found': len(results['extracted_orders']),
+            'download_urls': {
+                EXPORT_URL_KEYS.get(extension, extension): f'/jobs/{job_id}/partial?format={extension}'
+                for extension in formats
+            }
+        })
+    
+    download_name = f"partial_{job['filename'].replace('.pdf', '')}_{len(pages)}p.{export_format}"
+    if export_format == 'json':
+        content = io.BytesIO(json.dumps(results, ensure_ascii=False).encode('utf-8'))
+    elif export_format == 'jsonl':
+        content = io.BytesIO(''.join(
+            json.dumps(order, ensure_ascii=False) + '\n' for order in results['extracted_orders']
+        ).encode('utf-8'))
+    else:
+        content = export_bytes(results, export_format)
+    return send_file(content, as_attachment=True, download_name=download_name)
+
+def save_batch_file(file):
+    """Save an uploaded PDF, or every PDF inside an uploaded zip, to the upload folder
+    
+    Returns a list of ``(job_id, filename, filepath)`` tuples.
+    """
+    if not is_zip_file(file.filename):
+        job_id = new_job_id()
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+        file.save(filepath, buffer_size=UPLOAD_CHUNK_SIZE)
+        return [(job_id, filename, filepath)]
+    
+    saved = []
+    with zipfile.ZipFile(file.stream) as archive:
+        members = [m for m in archive.infolist() if not m.is_dir() and allowed_file(m.filename)]
+        if sum(m.file_size for m in members) > BATCH_MAX_EXTRACTED_BYTES:
+            raise ValueError(f"{file.filename} expands to more than {BATCH_MAX_EXTRACTED_BYTES} bytes")
+        
+        for member in members:
+            job_id = new_job_id()
+            filename = secure_filename(os.path.basename(member.filename))
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+            with archive.open(member) as src, open(filepath, 'wb') as dst:
+                shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+            saved.append((job_id, filename, filepath))
+    
+    return saved
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Queue several PDFs (or zip archives of PDFs) as one deduplicated batch"""
+    logger.info("Batch upload request received")
+    saved = []
+    
+    try:
+        files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+        if not files:
+            return jsonify({'error': 'No file selected'}), 400
+        
+        options = {
+            'max_pages': request.form.get('max_pages', type=int),
+            'debug_mode': request.form.get('debug_mode', 'false').lower() == 'true',
+            'bypass_cache': request.form.get('bypass_cache', 'false').lower() == 'true',
+            'multi_label': request.form.get('multi_label', str(MULTI_LABEL_PAGES)).lower() == 'true'
+        }
+        priority = parse_priority(request.form.get('priority'))
+        
+        rejected = []
+        for file in files:
+            if allowed_file(file.filename) or is_zip_file(file.filename):
+                saved.extend(save_batch_file(file))
+            else:
+                rejected.append(file.filename)
+        
+        if not saved:
+            return jsonify({'error': 'No PDF files found in upload', 'rejected': rejected}), 400
+        
+        if len(saved) > BATCH_MAX_FILES:
+            raise ValueError(f"Batch contains {len(saved)} PDFs; the limit is {BATCH_MAX_FILES}")
+        
+        batch_id = new_job_id()
+        job_store.create_batch(batch_id, saved, options, priority=priority)
+        job_workers.notify()
+        
+        return jsonify({
+            'success': True,
+            'batch_id': batch_id,
+            'status_url': f'/batches/{batch_id}',
+            'jobs': [
+                {'job_id': job_id, 'document': filename, 'status_url': f'/jobs/{job_id}'}
+                for job_id, filename, _ in saved
+            ],
+            'rejected': rejected
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Batch upload error: {e}")
+        for _, _, filepath in saved:
+            if os.path.exists(filepath):
                 os.remove(filepath)
-                logger.info(f"Cleaned up file: {filepath}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up file: {e}")
+        return jsonify({'error': f'Batch upload failed: {str(e)}'}), 400
+
+@app.route('/batches/<batch_id>')
+def batch_status(batch_id):
+    """Report per-document progress and, once finished, the merged batch results"""
+    batch = job_store.get_batch(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    jobs = job_store.get_batch_jobs(batch_id)
+    response = {
+        'batch_id': batch['id'],
+        'state': batch['state'],
+        'documents': [
+            {
+                'job_id': job['id'],
+                'document': job['filename'],
+                'state': job['state'],
+                'pages_done': job['pages_done'],
+                'pages_total': job['pages_total'],
+                'orders_found': job['orders_found']
+            }
+            for job in jobs
+        ],
+        'pages_done': sum(job['pages_done'] for job in jobs),
+        'pages_total': sum(job['pages_total'] for job in jobs),
+        'created_at': batch['created_at'],
+        'finished_at': batch['finished_at']
+    }
+    
+    if batch['state'] == 'completed':
+        try:
+            response.update(orders_response(batch['results']))
+        except ValueError:
+            return jsonify({'error': 'offset and limit must be integers'}), 400
+        response['download_urls'] = batch['download_urls']
+    elif batch['state'] == 'failed':
+        response['error'] = batch['error']
+    
+    return jsonify(response)
+
+def job_event_stream(job_id):
+    """Yield ``(event, data)`` pairs for a job until it finishes
+    
+    Orders are emitted as soon as their page is parsed, followed by a final
+    summary event carrying the download URLs.
+    """
+    last_seq = 0
+    last_progress = None
+    
+    while True:
+        job = job_store.get_job(job_id)
+        
+        for seq, order_data in job_store.get_orders(job_id, after_seq=last_seq):
+            last_seq = seq
+            yield 'order', order_data
+        
+        progress = (job['state'], job['pages_done'], job['pages_total'], job['orders_found'])
+        if progress != last_progress:
+            last_progress = progress
+            yield 'progress', {
+                'state': job['state'],
+                'pages_done': job['pages_done'],
+                'pages_total': job['pages_total'],
+                'orders_found': job['orders_found']
+            }
+        
+        if job['state'] == 'completed':
+            results = job['results']
+            yield 'summary', {
+                'state': 'completed',
+                'document': results['document'],
+                'total_pages': results['total_pages'],
+                'processed_pages': results['processed_pages'],
+                'orders_found': results.get('orders_found', len(results.get('extracted_orders', []))),
+                'processing_status': results['processing_status'],
+                'text_layer_pages': results.get('text_layer_pages', 0),
+                'debug_pages': results.get('debug_pages'),
+                'download_urls': job['download_urls'],
+                'debug_mode': job['options'].get('debug_mode', False)
+            }
+            return
+        
+        if job['state'] == 'failed':
+            yield 'summary', {'state': 'failed', 'error': job['error']}
+            return
+        
+        time.sleep(JOB_STREAM_POLL_INTERVAL)
+
+def parse_iso_date(value):
+    """Validate a YYYY-MM-DD query parameter, returning it unchanged"""
+    datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+@app.route('/orders')
+def query_orders():
+    """Filter stored orders by ID, job, batch, document, province, postcode or shipping date
+    
+    Results are latest shipping day first, ``limit`` per page; pass
+    ``cursor`` from the previous response to fetch the next page.
+    """
+    filters = {name: request.args[name] for name in EQUALITY_FILTERS if request.args.get(name)}
+    try:
+        date_from = parse_iso_date(request.args['date_from']) if request.args.get('date_from') else None
+        date_to = parse_iso_date(request.args['date_to']) if request.args.get('date_to') else None
+    except ValueError:
+        return jsonify({'error': 'date_from and date_to must be YYYY-MM-DD'}), 400
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    cursor = request.args.get('cursor') or None
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    orders, next_cursor = order_store.query(filters, date_from, date_to, limit=limit, cursor=cursor)
+    return jsonify({
+        'orders': orders,
+        'count': len(orders),
+        'limit': max(1, min(limit, MAX_PAGE_SIZE)),
+        'next_cursor': next_cursor
+    })
+
+@app.route('/orders/<order_id>')
+def get_order(order_id):
+    """Every stored occurrence of an order ID"""
+    orders = order_store.get_by_order_id(order_id)
+    if not orders:
+        return jsonify({'error': 'Order not found'}), 404
+    return jsonify({'order_id': order_id, 'orders': orders})
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's orders as Server-Sent Events, or NDJSON with ?format=ndjson"""
+    if job_store.get_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    stream_format = request.args.get('format', 'sse')
+    
+    if stream_format == 'ndjson':
+        def generate():
+            for event, data in job_event_stream(job_id):
+                yield json.dumps({'type': event, 'data': data}, ensure_ascii=False) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    def generate():
+        for event, data in job_event_stream(job_id):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def export_orders(result_name):
+    """Orders and document name for building an export of a stored result
+    
+    Orders are streamed from the JSON Lines file so an export of any size
+    is built in flat memory; results stored as a single JSON file are
+    loaded from it.
+    """
+    orders_path = os.path.join(RESULTS_FOLDER, f"{result_name}.jsonl")
+    summary_path = find_results_json(os.path.join(RESULTS_FOLDER, f"{result_name}.summary.json"))
+    if summary_path and os.path.exists(orders_path):
+        return iter_orders(orders_path), load_summary(summary_path).get('document', '')
+    json_path = find_results_json(os.path.join(RESULTS_FOLDER, f"{result_name}.json"))
+    if json_path is None:
+        raise FileNotFoundError(f"No orders left for {result_name}")
+    results = load_results_json(json_path)
+    return results['extracted_orders'], results.get('document', '')
 
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
-        return send_file(os.path.join(RESULTS_FOLDER, filename), as_attachment=True)
+        path = os.path.join(RESULTS_FOLDER, filename)
+        result_name, extension = os.path.splitext(filename)
+        if not os.path.exists(path):
+            orders_path = os.path.join(RESULTS_FOLDER, f"{result_name}.jsonl")
+            summary_path = find_results_json(os.path.join(RESULTS_FOLDER, f"{result_name}.summary.json"))
+            json_path = find_results_json(os.path.join(RESULTS_FOLDER, f"{result_name}.json"))
+            if extension == '.json' and summary_path and os.path.exists(orders_path):
+                # Not stored: the summary with the orders file copied in, built as it is sent
+                mark_used(orders_path)
+                return Response(results_json_chunks(load_summary(summary_path), orders_path),
+                                mimetype='application/json',
+                                headers={'Content-Disposition': f'attachment; filename={filename}'})
+            if extension == '.json' and json_path:
+                # Compressed by retention; serve it decompressed under its original name
+                return send_file(gzip.open(json_path, 'rb'), mimetype='application/json',
+                                 as_attachment=True, download_name=filename)
+            if extension[1:] in EXPORTERS and (summary_path or json_path):
+                ensure_export(lambda: export_orders(result_name), path, extension[1:])
+        mark_used(path)
+        # send_file resolves relative paths against the app root, not the working directory
+        return send_file(os.path.abspath(path), as_attachment=True)
     except Exception as e:
         logger.error(f"Download error: {e}")
         return jsonify({'error': 'File not found'}), 404
@@ -360,6 +1411,7 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    create_app()
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"=== DIRECT RUN ===")
     logger.info(f"Starting application on port {port}")
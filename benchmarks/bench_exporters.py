@@ -0,0 +1,123 @@
+"""Benchmark result exports: the old pandas DataFrame path vs the streaming exporters
+
+Each format/row-count pair runs in its own subprocess; peak RSS is
+reported along with the RSS already taken by the synthetic orders, so
+``export_peak_mb`` is what the export itself added.
+
+    python benchmarks/bench_exporters.py --rows 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def make_results(rows, seed=0):
+    rng = random.Random(seed)
+    provinces = ["ยะลา", "นราธิวาส", "อุบลราชธานี", "สมุทรปราการ", "กรุงเทพมหานคร"]
+    orders = []
+    for page in range(1, rows + 1):
+        province = rng.choice(provinces)
+        orders.append({
+            "page": page,
+            "recipient_name": f"ผู้รับ {rng.randrange(10 ** 6)}",
+            "recipient_address": f"{rng.randrange(999)}/1 ม.{rng.randrange(12)} ต.ทดสอบ อ.ทดสอบ {province}",
+            "parsed_address": {
+                "street_address": f"{rng.randrange(999)}/1",
+                "subdistrict": "ทดสอบ",
+                "district": "ทดสอบ",
+                "province": province,
+                "postal_code": f"{rng.randrange(10000, 99999)}"
+            },
+            "order_id": str(579199000000000000 + rng.randrange(10 ** 12)),
+            "shipping_date": "11/06/2025 23:59",
+            "cod": f"{rng.randrange(100, 2000)}",
+            "weight": "0.5 kg"
+        })
+    return {"document": "bench.pdf", "extracted_orders": orders}
+
+def export_legacy_pandas(results, path):
+    """The previous create_excel_file: list of dicts -> DataFrame -> openpyxl"""
+    import pandas as pd
+
+    excel_data = []
+    for order in results["extracted_orders"]:
+        excel_data.append({
+            'เอกสาร': order.get('document', results.get('document', '')),
+            'หน้า': order['page'],
+            'Order ID': order['order_id'],
+            'ชื่อผู้รับ': order['recipient_name'],
+            'วันที่จัดส่ง': order['shipping_date'],
+            'ที่อยู่เดิม': order['recipient_address'],
+            'ที่อยู่ละเอียด': order['parsed_address'].get('street_address', ''),
+            'ตำบล': order['parsed_address'].get('subdistrict', ''),
+            'อำเภอ': order['parsed_address'].get('district', ''),
+            'จังหวัด': order['parsed_address'].get('province', ''),
+            'รหัสไปรษณีย์': order['parsed_address'].get('postal_code', ''),
+            'COD': order.get('cod', ''),
+            'น้ำหนัก': order.get('weight', '')
+        })
+    df = pd.DataFrame(excel_data)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='ข้อมูลการจัดส่ง', index=False)
+
+MODES = ["legacy_pandas_xlsx", "xlsx", "csv", "parquet"]
+
+def run_mode(mode, rows, out_dir):
+    from exporters import write_export
+
+    results = make_results(rows)
+    base_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    path = os.path.join(out_dir, f"{mode}_{rows}.{'xlsx' if mode.endswith('xlsx') else mode}")
+
+    start = time.perf_counter()
+    if mode == "legacy_pandas_xlsx":
+        export_legacy_pandas(results, path)
+    else:
+        write_export(results, path, mode)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "export_peak_mb": round(peak_rss_mb - base_rss_mb, 1),
+        "file_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.rows[0], args.out)))
+        return
+
+    report = {"runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            for mode in args.modes:
+                out = subprocess.check_output(
+                    [sys.executable, __file__, "--mode", mode, "--rows", str(rows), "--out", tmp]
+                )
+                report["runs"].append(json.loads(out))
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
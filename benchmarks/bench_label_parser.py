@@ -0,0 +1,122 @@
+"""Regression check and micro-benchmark for label_parser
+
+Verifies every sample in label_corpus.json, then times parse_label against
+the regex chain previously used in extract_shipping_info, on the corpus
+and on pathological inputs. Exits non-zero if any corpus sample regresses.
+
+    python benchmarks/bench_label_parser.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_parser import parse_label, parse_labels, split_labels
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "label_corpus.json")
+
+def legacy_extract(text):
+    """The regex chain extract_shipping_info used before label_parser"""
+    data = {"recipient_name": "", "recipient_address": "", "order_id": "", "shipping_date": ""}
+    recipient_pattern = r'ถึง\s+(.+?)\n((?:.+?\n)*?)(?=\(\+\)|COD|Weight|\n\n|Order|$)'
+    recipient_match = re.search(recipient_pattern, text, re.IGNORECASE | re.DOTALL | re.MULTILINE)
+    if recipient_match:
+        data["recipient_name"] = recipient_match.group(1).strip()
+        raw_address = re.sub(r'\s+', ' ', re.sub(r'\n+', ' ', recipient_match.group(2).strip()))
+        data["recipient_address"] = raw_address
+    order_id_match = re.search(r'Order ID\s*:?\s*\n?(\d+)', text, re.IGNORECASE)
+    if order_id_match:
+        data["order_id"] = order_id_match.group(1).strip()
+    shipping_date_match = re.search(r'Shipping Date:\s*\n?(.+?)(?:\n|\r|$)', text, re.IGNORECASE)
+    if shipping_date_match:
+        data["shipping_date"] = shipping_date_match.group(1).strip()
+    return data
+
+def time_call(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat
+
+def check_corpus(corpus):
+    failures = []
+    for case in corpus:
+        actual = parse_label(case["text"])
+        if actual != case["expected"]:
+            failures.append({"name": case["name"], "expected": case["expected"], "actual": actual})
+        # Samples with "labels" also check how parse_labels splits the page
+        if "labels" in case:
+            labels = parse_labels(case["text"])
+            if labels != case["labels"]:
+                failures.append({"name": case["name"], "expected": case["labels"], "actual": labels})
+    return failures
+
+def pathological_inputs(lines):
+    """Inputs that made the old recipient pattern backtrack"""
+    return {
+        # Unterminated address block: exponential in the number of lines
+        "unterminated_address": "ถึง a\n" + "b\n" * lines + "c",
+        # Long run of whitespace after the marker: quadratic
+        "whitespace_run": "ถึง " + " " * (lines * 200),
+        # Many repeated markers
+        "repeated_markers": "ถึง a\n" + "ถึง b c\n" * (lines * 100),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = check_corpus(corpus)
+    report = {"corpus_samples": len(corpus), "corpus_failures": failures, "corpus": [], "pathological": [],
+              "split_labels": []}
+
+    for case in corpus:
+        report["corpus"].append({
+            "name": case["name"],
+            "legacy_us": round(time_call(legacy_extract, case["text"], args.repeat) * 1e6, 2),
+            "parse_label_us": round(time_call(parse_label, case["text"], args.repeat) * 1e6, 2),
+        })
+
+    # The legacy pattern is only run at sizes where it still finishes
+    for lines in (10, 16, 20):
+        for name, text in pathological_inputs(lines).items():
+            report["pathological"].append({
+                "name": name,
+                "lines": lines,
+                "chars": len(text),
+                "legacy_ms": round(time_call(legacy_extract, text, 1) * 1e3, 3),
+                "parse_label_ms": round(time_call(parse_label, text, 1) * 1e3, 3),
+            })
+    for name, text in pathological_inputs(10000).items():
+        report["pathological"].append({
+            "name": name,
+            "lines": 10000,
+            "chars": len(text),
+            "legacy_ms": None,
+            "parse_label_ms": round(time_call(parse_label, text, 1) * 1e3, 3),
+        })
+
+    # Order ID headings with the value on the next line; time should double with the labels
+    for labels in (4000, 8000, 16000):
+        text = "".join(f"Order ID\n{i}\nถึง a\n" for i in range(labels))
+        report["split_labels"].append({
+            "name": "order_id_heading_per_label",
+            "labels": labels,
+            "split_labels_ms": round(time_call(split_labels, text, 1) * 1e3, 3),
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark OrderStore lookups at millions of stored orders
+
+Fills a temporary store with synthetic orders (in jobs of --job-size)
+and reports the median latency of the query shapes the /orders API
+serves, including pages deep into a result set.
+
+    python benchmarks/bench_order_store.py --orders 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from order_store import OrderStore
+
+PROVINCES = ["ยะลา", "นราธิวาส", "อุบลราชธานี", "สมุทรปราการ", "กรุงเทพมหานคร", "ปัตตานี", "สงขลา", "เชียงใหม่"]
+
+def make_orders(rng, count):
+    orders = []
+    for page in range(1, count + 1):
+        province = rng.choice(PROVINCES)
+        orders.append({
+            "page": page,
+            "order_id": str(579199000000000000 + rng.randrange(10 ** 12)),
+            "recipient_name": f"ผู้รับ {rng.randrange(10 ** 6)}",
+            "recipient_address": f"{rng.randrange(999)}/1 ม.{rng.randrange(12)} {province}",
+            "parsed_address": {"province": province, "postal_code": f"{rng.randrange(10000, 99999)}"},
+            "shipping_date": f"{rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/2025 23:59",
+            "cod": "", "weight": ""
+        })
+    return orders
+
+def median_us(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1e6, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--job-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OrderStore(os.path.join(tmp, "orders.db"))
+        start = time.perf_counter()
+        known_ids = []
+        for job in range(0, args.orders, args.job_size):
+            orders = make_orders(rng, min(args.job_size, args.orders - job))
+            known_ids.append(orders[0]["order_id"])
+            store.add_orders(f"job{job}", f"doc{job}.pdf", orders)
+        fill_seconds = time.perf_counter() - start
+
+        _, cursor = store.query({"province": "ยะลา"}, limit=50)
+        for _ in range(200):
+            _, deep_cursor = store.query({"province": "ยะลา"}, limit=50, cursor=cursor)
+            cursor = deep_cursor or cursor
+
+        queries = {
+            "order_id_lookup": lambda: store.get_by_order_id(rng.choice(known_ids)),
+            "order_id_miss": lambda: store.get_by_order_id("0"),
+            "province_page": lambda: store.query({"province": "ยะลา"}, limit=50),
+            "province_page_deep": lambda: store.query({"province": "ยะลา"}, limit=50, cursor=cursor),
+            "province_date_range_page": lambda: store.query(
+                {"province": "สงขลา"}, date_from="2025-03-01", date_to="2025-03-07", limit=50
+            ),
+            "date_range_page": lambda: store.query(date_from="2025-06-01", date_to="2025-06-02", limit=50),
+            "document_page": lambda: store.query({"document": "doc0.pdf"}, limit=50),
+            "unfiltered_page": lambda: store.query(limit=50),
+        }
+        report = {
+            "orders": args.orders,
+            "fill_seconds": round(fill_seconds, 1),
+            "db_mb": round(os.path.getsize(os.path.join(tmp, "orders.db")) / 1024 / 1024, 1),
+            "median_us": {name: median_us(func, args.repeat) for name, func in queries.items()},
+        }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
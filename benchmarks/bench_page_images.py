@@ -0,0 +1,66 @@
+"""Benchmark the pre-OCR page stage against sending raw PDF pages
+
+For a synthetic label PDF (or --pdf), reports the median per-page cost of
+extracting a single-page PDF versus rendering/cropping to PNG, and the
+payload size each sends to OCR, at a few DPI and crop settings.
+
+    python benchmarks/bench_page_images.py --pages 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_pdf import write_label_pdf
+from page_images import PREPROCESSING_AVAILABLE, PagePreprocessor, parse_regions
+from pdf_document import PDFDocument
+
+SETTINGS = [
+    {"dpi": 200, "regions": ""},
+    {"dpi": 150, "regions": ""},
+    {"dpi": 100, "regions": ""},
+    # Recipient block and order ID/date strip of a 4x6 label
+    {"dpi": 150, "regions": "0,0,1,0.35;0,0.8,1,1"},
+]
+
+def measure(document, pages, func):
+    times, sizes = [], []
+    for page_num in range(1, pages + 1):
+        start = time.perf_counter()
+        payload = func(document, page_num)
+        times.append(time.perf_counter() - start)
+        sizes.append(len(payload))
+    return {
+        "median_ms": round(statistics.median(times) * 1e3, 2),
+        "mean_payload_kb": round(statistics.mean(sizes) / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--pdf", help="benchmark an existing PDF instead of a synthetic one")
+    args = parser.parse_args()
+
+    if not PREPROCESSING_AVAILABLE:
+        sys.exit("pypdfium2 and Pillow are required for this benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or write_label_pdf(os.path.join(tmp, "labels.pdf"), args.pages)
+        with PDFDocument(pdf_path) as document:
+            pages = min(args.pages, document.page_count)
+            report = {"pages": pages, "pdf_page": measure(document, pages, PDFDocument.page_bytes), "rendered": []}
+            for setting in SETTINGS:
+                preprocessor = PagePreprocessor(dpi=setting["dpi"], regions=parse_regions(setting["regions"]))
+                result = measure(document, pages, lambda d, n: preprocessor.prepare(d, n).image_bytes)
+                report["rendered"].append(dict(setting, **result))
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark PDF parsing: reopening the PDF per page vs one shared PDFDocument
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+
+    python benchmarks/bench_pdf_document.py --pages 120
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def run_per_page_reopen(pdf_path):
+    """The previous behaviour: parse the whole PDF again for every page"""
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as f:
+        total = len(PyPDF2.PdfReader(f).pages)
+    for page_num in range(1, total + 1):
+        with open(pdf_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            writer = PyPDF2.PdfWriter()
+            writer.add_page(reader.pages[page_num - 1])
+            writer.write(io.BytesIO())
+    return total
+
+def run_shared_document(pdf_path):
+    from pdf_document import PDFDocument
+
+    with PDFDocument(pdf_path) as document:
+        total = document.page_count
+        for page_num in range(1, total + 1):
+            document.page_bytes(page_num)
+    return total
+
+MODES = {
+    "per_page_reopen": run_per_page_reopen,
+    "shared_document": run_shared_document,
+}
+
+def run_mode(mode, pdf_path):
+    start = time.perf_counter()
+    pages = MODES[mode](pdf_path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "mode": mode,
+        "pages": pages,
+        "seconds": round(elapsed, 4),
+        "ms_per_page": round(elapsed * 1000 / pages, 3),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--pdf", help="benchmark an existing PDF instead of a synthetic one")
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.pdf)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            from benchmarks.synthetic_pdf import write_label_pdf
+            pdf_path = write_label_pdf(os.path.join(tmp, "labels.pdf"), args.pages)
+
+        report = {"pdf_size_mb": round(os.path.getsize(pdf_path) / 1024 / 1024, 2), "runs": []}
+        for mode in MODES:
+            out = subprocess.check_output(
+                [sys.executable, __file__, "--mode", mode, "--pdf", pdf_path]
+            )
+            report["runs"].append(json.loads(out))
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
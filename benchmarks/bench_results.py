@@ -0,0 +1,179 @@
+"""Benchmark holding and serializing a large job's orders, before and after Order records
+
+Builds --orders orders from the label corpus (--labels-per-page to a
+page) and compares the two ways results have been handled:
+
+- before: every order a nested dict held in ``results``, written once to
+  the JSON result file with ``indent=2``, again into the job store, and a
+  third time into the /jobs/<id> response with the whole order list;
+- after: Order records, appended to the JSON Lines file page by page,
+  the JSON result file assembled from those lines, and the job store and
+  response holding the summary plus one page of orders.
+
+Reports traced memory of the orders, the time and bytes of each
+serialization step, and totals for both.
+
+    python benchmarks/bench_results.py --orders 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_suite import CORPUS_PATH, import_app
+
+def label_infos(app):
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        texts = [sample["text"] for sample in json.load(f)]
+    infos = [app.extract_shipping_info(text) for text in texts]
+    return [info for info in infos if info["order_id"] or info["recipient_name"]]
+
+def unique_info(info, index):
+    """A copy of ``info`` with fresh strings, as every real order has its own"""
+    address = {key: f"{value} " for key, value in info["parsed_address"].items()}
+    return {
+        "recipient_name": f"{info['recipient_name']} {index}",
+        "recipient_address": address.get("full_address", f"{info['recipient_address']} "),
+        "parsed_address": address,
+        "order_id": f"{info['order_id']}{index}",
+        "shipping_date": f"{info['shipping_date']} ",
+        "cod": f"{info['cod']} ",
+        "weight": f"{info['weight']} "
+    }
+
+def legacy_order(page, info):
+    """order_data as process_page built it before Order records"""
+    return {
+        "page": page,
+        "recipient_name": info["recipient_name"],
+        "recipient_address": info["recipient_address"],
+        "parsed_address": info["parsed_address"],
+        "order_id": info["order_id"],
+        "shipping_date": info["shipping_date"],
+        "cod": info["cod"],
+        "weight": info["weight"]
+    }
+
+def build(args, infos, make_order):
+    """Build the orders under tracemalloc; returns ``(orders, traced_mb)``"""
+    tracemalloc.start()
+    orders = []
+    for index in range(args.orders):
+        page = index // args.labels_per_page + 1
+        slot = index % args.labels_per_page + 1
+        orders.append(make_order(page, slot, unique_info(infos[index % len(infos)], index)))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return orders, round(size / 2 ** 20, 2)
+
+def timed_ms(func):
+    start = time.perf_counter()
+    value = func()
+    return value, round((time.perf_counter() - start) * 1e3, 1)
+
+def results_for(orders, pages):
+    return {
+        "document": "bench.pdf",
+        "total_pages": pages,
+        "processed_pages": pages,
+        "extracted_orders": orders,
+        "processing_status": "success",
+        "failed_pages": [],
+        "skipped_pages": {"blank": [], "duplicate": []},
+        "ocr_stats": {"calls": pages},
+        "debug_pages": None,
+        "timings": None
+    }
+
+def run_before(args, app, infos, work_dir):
+    orders, memory_mb = build(args, infos, lambda page, slot, info: legacy_order(page, info))
+    results = results_for(orders, orders[-1]["page"])
+    path = os.path.join(work_dir, "before.json")
+
+    def write_json():
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    _, json_ms = timed_ms(write_json)
+    stored, store_ms = timed_ms(lambda: json.dumps(results, ensure_ascii=False))
+    with app.app.app_context():
+        response, response_ms = timed_ms(lambda: app.app.json.dumps({'state': 'completed', 'results': results}))
+    return {
+        "orders_mb": memory_mb,
+        "result_file_ms": json_ms,
+        "result_file_bytes": os.path.getsize(path),
+        "job_store_ms": store_ms,
+        "job_store_bytes": len(stored.encode()),
+        "response_ms": response_ms,
+        "response_bytes": len(response.encode()),
+        "total_ms": round(json_ms + store_ms + response_ms, 1)
+    }
+
+def run_after(args, app, infos):
+    orders, memory_mb = build(args, infos, app.Order.from_shipping_info)
+    results = results_for(orders, orders[-1].page)
+    result_name = app.new_result_name("bench.pdf")
+    orders_path = os.path.join(app.RESULTS_FOLDER, f"{result_name}.jsonl")
+
+    def log_pages():
+        # Written page by page while the job runs, so this cost is spread over the job
+        with app.OrderLog(orders_path) as order_log:
+            for start in range(0, len(orders), args.labels_per_page):
+                order_log.write(orders[start:start + args.labels_per_page])
+
+    _, log_ms = timed_ms(log_pages)
+    _, save_ms = timed_ms(lambda: app.save_results(results, "bench.pdf", result_name))
+    summary = dict(app.results_summary(results), orders_file=f"{result_name}.jsonl")
+    stored, store_ms = timed_ms(lambda: json.dumps(summary, ensure_ascii=False))
+    with app.app.test_request_context('/jobs/bench'):
+        response, response_ms = timed_ms(
+            lambda: app.app.json.dumps(dict(app.orders_response(summary), state='completed'))
+        )
+    return {
+        "orders_mb": memory_mb,
+        "order_log_ms": log_ms,
+        "result_file_ms": save_ms,
+        # Everything stored for the result; the JSON download is streamed from these
+        "result_file_bytes": sum(os.path.getsize(os.path.join(app.RESULTS_FOLDER, f"{result_name}{suffix}"))
+                                 for suffix in (".jsonl", ".summary.json")),
+        "job_store_ms": store_ms,
+        "job_store_bytes": len(stored.encode()),
+        "response_ms": response_ms,
+        "response_bytes": len(response.encode()),
+        "total_ms": round(log_ms + save_ms + store_ms + response_ms, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--labels-per-page", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        app = import_app(work_dir, 0)
+        # The first call imports pyarrow to see if Parquet is available
+        app.available_formats()
+        infos = label_infos(app)
+        before = run_before(args, app, infos, work_dir)
+        after = run_after(args, app, infos)
+
+    report = {
+        "orders": args.orders,
+        "labels_per_page": args.labels_per_page,
+        "before": before,
+        "after": after,
+        "orders_memory_saved_pct": round((1 - after["orders_mb"] / before["orders_mb"]) * 100, 1),
+        "serialization_speedup": round(before["total_ms"] / after["total_ms"], 2)
+    }
+    print(json.dumps(report, indent=2))
+    # Job worker threads never exit on their own
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark how long a small upload takes while large uploads hold the OCR slots
+
+Uploads --big-jobs PDFs of --big-pages pages, waits until they are
+OCR'ing, then uploads one --small-pages PDF at --priority, all through
+the Flask app with the mock OCR backend at --ocr-latency-ms. Reports the
+small job's end-to-end latency, time queued for a job worker and time
+its OCR calls waited for a slot, the large jobs' latencies and the
+deepest OCR queue seen. Run with --job-workers 2 --priority normal for
+the old behaviour, where the small job waits for a large one to finish.
+
+    python benchmarks/bench_scheduler.py --big-jobs 2 --big-pages 118 --small-pages 2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_suite import import_app
+from benchmarks.synthetic_pdf import write_label_pdf
+
+def upload(client, pdf_path, priority):
+    with open(pdf_path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, os.path.basename(pdf_path)), 'priority': priority})
+    return response.get_json()["job_id"]
+
+def wait_for(client, job_id, started):
+    while True:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job["state"] in ("completed", "failed"):
+            break
+        time.sleep(0.02)
+    return {
+        "state": job["state"],
+        "pages": job["pages_total"],
+        "priority": job["priority"],
+        "latency_seconds": round(time.perf_counter() - started, 3),
+        "queue_seconds": job["queue_seconds"],
+        "ocr_queue_wait_seconds": (job.get("results") or {}).get("ocr_stats", {}).get("queue_wait_seconds")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--big-jobs", type=int, default=2)
+    parser.add_argument("--big-pages", type=int, default=118)
+    parser.add_argument("--small-pages", type=int, default=2)
+    parser.add_argument("--priority", default="high", help="priority of the small upload")
+    parser.add_argument("--job-workers", type=int, default=None, help="JOB_WORKERS (default the app's)")
+    parser.add_argument("--ocr-latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    if args.job_workers:
+        os.environ['JOB_WORKERS'] = str(args.job_workers)
+    # Every page goes through OCR
+    os.environ.update({'TEXT_LAYER_ENABLED': 'false', 'OCR_PREPROCESS': 'false'})
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        app = import_app(work_dir, args.ocr_latency_ms)
+        client = app.app.test_client()
+        big_pdf = write_label_pdf(os.path.join(work_dir, "big.pdf"), args.big_pages)
+        small_pdf = write_label_pdf(os.path.join(work_dir, "small.pdf"), args.small_pages)
+
+        max_depth = 0
+        done = threading.Event()
+
+        def sample_depth():
+            nonlocal max_depth
+            while not done.is_set():
+                max_depth = max(max_depth, app.ocr_client.limiter.stats()["waiting"])
+                time.sleep(0.01)
+
+        sampler = threading.Thread(target=sample_depth, daemon=True)
+        sampler.start()
+
+        started = time.perf_counter()
+        big_ids = [upload(client, big_pdf, "normal") for _ in range(args.big_jobs)]
+        # Let the large jobs fill every OCR slot first
+        while app.ocr_client.limiter.stats()["in_flight"] < app.ocr_client.limiter.limit:
+            time.sleep(0.01)
+        small_started = time.perf_counter()
+        small = wait_for(client, upload(client, small_pdf, args.priority), small_started)
+        big = [wait_for(client, job_id, started) for job_id in big_ids]
+        done.set()
+
+    report = {
+        "settings": {
+            "job_workers": app.JOB_WORKERS,
+            "ocr_max_concurrency": app.OCR_MAX_CONCURRENCY,
+            "ocr_job_max_in_flight": app.OCR_JOB_MAX_IN_FLIGHT,
+            "priority_weights": app.JOB_PRIORITY_WEIGHTS,
+            "ocr_latency_ms": args.ocr_latency_ms
+        },
+        "small_job": small,
+        "big_jobs": big,
+        "max_ocr_queue_depth": max_depth
+    }
+    print(json.dumps(report, indent=2))
+    # Job worker threads never exit on their own
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark cold start: importing app.py and time to the first healthy /health
+
+Reports, each as the median over --repeat fresh interpreters:
+
+- import_ms: ``import app`` alone;
+- first_health_ms: from launching the server until /health first
+  answers 200, with gunicorn started the way start.py does (one web
+  worker, job workers in-process) and the mock OCR backend;
+
+plus the slowest modules from ``python -X importtime`` for one import.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def child_env(work_dir):
+    env = dict(os.environ, OCR_BACKEND='mock', PYTHONPATH=os.pathsep.join(
+        [ROOT] + ([os.environ['PYTHONPATH']] if os.environ.get('PYTHONPATH') else [])
+    ))
+    env.pop('RAILWAY_ENVIRONMENT', None)
+    env.pop('FLASK_ENV', None)
+    return env
+
+def import_ms(work_dir):
+    out = subprocess.check_output(
+        [sys.executable, "-c",
+         "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"],
+        cwd=work_dir, env=child_env(work_dir), stderr=subprocess.DEVNULL, text=True
+    )
+    return float(out.strip().splitlines()[-1]) * 1e3
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def first_health_ms(work_dir, entry_point, timeout):
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", entry_point,
+           "--workers", "1", "--worker-class", "gthread", "--threads", "8"]
+    start = time.perf_counter()
+    server = subprocess.Popen(cmd, cwd=work_dir, env=child_env(work_dir),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1e3
+            except requests.RequestException:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError("/health did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+def slowest_imports(work_dir, count):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=work_dir,
+                          env=child_env(work_dir), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == "site":
+            # Everything so far was interpreter startup
+            modules = []
+        # Modules app.py imports directly, so nested ones aren't counted twice
+        elif name.startswith(" " * 3) and not name.startswith(" " * 5):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return {name: round(ms, 1) for name, ms in modules[:count]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--entry-point", default="app:create_app()", help="gunicorn application to start")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        imports = [import_ms(work_dir) for _ in range(args.repeat)]
+        health = [first_health_ms(work_dir, args.entry_point, args.timeout) for _ in range(args.repeat)]
+        report = {
+            "entry_point": args.entry_point,
+            "import_ms": round(statistics.median(imports), 1),
+            "first_health_ms": round(statistics.median(health), 1),
+            "first_health_ms_max": round(max(health), 1),
+            "slowest_imports_ms": slowest_imports(work_dir, 10)
+        }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""End-to-end benchmark suite for the OCR pipeline, with JSON output for comparing versions
+
+Generates synthetic label PDFs at each --pages size and, with the mock
+OCR backend at --ocr-latency-ms of simulated latency, reports:
+
+- per-function timings: get_pdf_page_count, extract_shipping_info on the
+  label corpus, and write_export (the old create_excel_file) per format;
+- /upload end to end: --uploads concurrent uploads per size through the
+  Flask app, from POST to job completion, with pages/second throughput;
+- peak RSS of every section, each run in its own subprocess.
+
+The report records the git commit and settings. Save it with --output
+and pass an earlier report to --compare to get the change of every
+metric between the two runs.
+
+    python benchmarks/bench_suite.py --pages 1 10 50 --uploads 4 --output bench.json
+    python benchmarks/bench_suite.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "label_corpus.json")
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1e3, 3)
+
+def import_app(work_dir, ocr_latency_ms):
+    """Import app.py with its folders and stores under ``work_dir`` and the mock OCR backend"""
+    os.environ.pop('RAILWAY_ENVIRONMENT', None)
+    os.environ.pop('FLASK_ENV', None)
+    os.environ.update({
+        'OCR_BACKEND': 'mock',
+        'MOCK_OCR_LATENCY_MS': str(ocr_latency_ms),
+        'OCR_CACHE_ENABLED': 'false',
+        'RUN_BACKGROUND_WORKERS': 'true',
+    })
+    os.chdir(work_dir)
+    import logging
+    import app
+    app.create_app()
+    # Per-page INFO logging would dominate the timings
+    logging.disable(logging.INFO)
+    return app
+
+def run_functions(args, work_dir):
+    from benchmarks.synthetic_pdf import write_label_pdf
+    from exporters import available_formats, write_export
+
+    app = import_app(work_dir, args.ocr_latency_ms)
+
+    page_count = {}
+    for pages in args.pages:
+        pdf_path = write_label_pdf(os.path.join(work_dir, f"labels_{pages}.pdf"), pages)
+        page_count[str(pages)] = median_ms(lambda: app.get_pdf_page_count(pdf_path), args.repeat)
+
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        texts = [sample["text"] for sample in json.load(f)]
+    parse_ms = median_ms(lambda: [app.extract_shipping_info(text) for text in texts], args.repeat)
+
+    order = dict(app.extract_shipping_info(texts[0]), page=1)
+    orders = [dict(order, page=page) for page in range(1, args.export_rows + 1)]
+    results = {"document": "bench.pdf", "extracted_orders": orders}
+    exports = {}
+    for extension in available_formats():
+        path = os.path.join(work_dir, f"export.{extension}")
+        # The first call pays for importing the format's library
+        write_export(results, path, extension)
+        exports[extension] = median_ms(lambda: write_export(results, path, extension), max(1, args.repeat // 10))
+
+    return {
+        "get_pdf_page_count_ms": page_count,
+        "extract_shipping_info_ms_per_label": round(parse_ms / len(texts), 4),
+        "write_export_ms": {"rows": args.export_rows, **exports},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_uploads(args, work_dir, pages):
+    from benchmarks.synthetic_pdf import write_label_pdf
+
+    app = import_app(work_dir, args.ocr_latency_ms)
+    pdf_path = write_label_pdf(os.path.join(work_dir, "labels.pdf"), pages)
+    base_rss_mb = peak_rss_mb()
+
+    def upload(result):
+        client = app.app.test_client()
+        start = time.perf_counter()
+        with open(pdf_path, 'rb') as f:
+            response = client.post('/upload', data={'file': (f, 'labels.pdf'), 'bypass_cache': 'true'})
+        result["submit_ms"] = (time.perf_counter() - start) * 1e3
+        job_id = response.get_json()["job_id"]
+        while True:
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job["state"] in ("completed", "failed"):
+                break
+            time.sleep(0.02)
+        result["seconds"] = time.perf_counter() - start
+        result["state"] = job["state"]
+        result["orders"] = job["orders_found"]
+
+    uploads = [{} for _ in range(args.uploads)]
+    threads = [threading.Thread(target=upload, args=(result,)) for result in uploads]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [result["seconds"] for result in uploads]
+    return {
+        "pages": pages,
+        "uploads": args.uploads,
+        "completed": sum(result["state"] == "completed" for result in uploads),
+        "orders": sum(result["orders"] for result in uploads),
+        "submit_ms_median": round(statistics.median(result["submit_ms"] for result in uploads), 1),
+        "latency_seconds_median": round(statistics.median(latencies), 3),
+        "latency_seconds_max": round(max(latencies), 3),
+        "wall_seconds": round(elapsed, 3),
+        "pages_per_second": round(pages * args.uploads / elapsed, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "upload_peak_mb": round(peak_rss_mb() - base_rss_mb, 1)
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(report, prefix=""):
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and "pages" in item:
+                    values.update(flatten(item, f"{name}[pages={item['pages']}]."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+def compare(before, after):
+    """Every numeric metric present in both reports, with its relative change"""
+    old, new = flatten(before["results"]), flatten(after["results"])
+    changes = {}
+    for name in sorted(old.keys() & new.keys()):
+        change = round((new[name] - old[name]) / old[name] * 100, 1) if old[name] else None
+        changes[name] = {"before": old[name], "after": new[name], "change_pct": change}
+    return {"before": before["meta"], "after": after["meta"], "metrics": changes}
+
+def run_child(args, section):
+    cmd = [sys.executable, __file__, "--section", section,
+           "--pages", *map(str, args.pages), "--uploads", str(args.uploads),
+           "--ocr-latency-ms", str(args.ocr_latency_ms), "--repeat", str(args.repeat),
+           "--export-rows", str(args.export_rows)]
+    out = subprocess.check_output(cmd, stderr=None if args.verbose else subprocess.DEVNULL)
+    return json.loads(out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50], help="page counts to upload")
+    parser.add_argument("--uploads", type=int, default=4, help="concurrent uploads per page count")
+    parser.add_argument("--ocr-latency-ms", type=float, default=200, help="simulated mock OCR latency")
+    parser.add_argument("--repeat", type=int, default=50, help="repetitions for function timings")
+    parser.add_argument("--export-rows", type=int, default=10000)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="report from an earlier run to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the app's logs")
+    parser.add_argument("--section", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.section:
+        with tempfile.TemporaryDirectory() as work_dir:
+            if args.section == "functions":
+                result = run_functions(args, work_dir)
+            else:
+                result = run_uploads(args, work_dir, int(args.section.split(":")[1]))
+        print(json.dumps(result))
+        # Job worker threads never exit on their own
+        os._exit(0)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {
+                "pages": args.pages,
+                "uploads": args.uploads,
+                "ocr_latency_ms": args.ocr_latency_ms,
+                "repeat": args.repeat,
+                "export_rows": args.export_rows
+            }
+        },
+        "results": {
+            "functions": run_child(args, "functions"),
+            "uploads": [run_child(args, f"upload:{pages}") for pages in args.pages]
+        }
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report = compare(json.load(f), report)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
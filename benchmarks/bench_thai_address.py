@@ -0,0 +1,72 @@
+"""Benchmark Thai address resolution against the bundled gazetteer
+
+Reports gazetteer load time and per-address resolution cost for the
+addresses in clean_orders.json plus a few synthetic variants.
+
+    python benchmarks/bench_thai_address.py
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_parser import parse_address
+from thai_address import DEFAULT_GAZETTEER_PATH, ThaiGazetteer, resolve_address
+
+EXTRA_ADDRESSES = [
+    "99 ถ.สุขุมวิท แขวงคลองเตย เขตคลองเตย กรุงเทพมหานคร 10110",
+    "12 ม.3 อ.เมือง จ.ยะลา 95000",
+    "1/1 หาดใหญ สงขลา 90110",
+    "55 ม.2 ต.นาโพธิ์, กุดรัง, มหาสารคาม, 44130",
+    # Road named after a province (ตาก), no postcode
+    "99 ถ.ตากสิน แขวงบุคคโล เขตธนบุรี กรุงเทพมหานคร",
+    "no address here",
+]
+
+def load_addresses():
+    with open(os.path.join(ROOT, "clean_orders.json"), encoding="utf-8") as f:
+        orders = json.load(f)["orders"]
+    return [order["recipient_address"] for order in orders] + EXTRA_ADDRESSES
+
+def per_call_us(func, arg, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1e6, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--gazetteer", default=DEFAULT_GAZETTEER_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gazetteer = ThaiGazetteer.load(args.gazetteer)
+    load_ms = (time.perf_counter() - start) * 1e3
+
+    addresses = load_addresses()
+    # Warm the lazily compiled per-province patterns
+    for address in addresses:
+        resolve_address(address, gazetteer)
+
+    report = {"gazetteer_load_ms": round(load_ms, 2), "addresses": []}
+    for address in addresses:
+        report["addresses"].append({
+            "address": address,
+            "resolved": resolve_address(address, gazetteer),
+            "comma_split_us": per_call_us(parse_address, address, args.repeat),
+            "resolve_us": per_call_us(lambda a: resolve_address(a, gazetteer), address, args.repeat),
+        })
+    report["median_resolve_us"] = statistics.median(a["resolve_us"] for a in report["addresses"])
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
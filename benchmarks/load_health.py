@@ -0,0 +1,154 @@
+"""Load test: /health latency while uploads are being processed
+
+Measures /health latency against a running server, first idle and then
+while --uploads synthetic label PDFs (or --pdf) are uploaded at once and
+processed, and reports percentiles for both phases plus how long the
+uploads took. Run it against the production mode and the single-process
+mode to compare, e.g. with the mock OCR backend:
+
+    OCR_BACKEND=mock MOCK_OCR_LATENCY_MS=300 PORT=8080 python start.py
+    python benchmarks/load_health.py --url http://127.0.0.1:8080 --uploads 4 --pages 40
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_pdf import write_label_pdf
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1e3, 1)
+
+    return {
+        "requests": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1e3, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1e3, 1)
+    }
+
+class HealthProbe:
+    """Threads calling /health back to back and recording each latency"""
+
+    def __init__(self, url, concurrency, timeout):
+        self.url = f"{url}/health"
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.samples = []
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _run(self):
+        session = requests.Session()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                ok = session.get(self.url, timeout=self.timeout).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                if ok:
+                    self.samples.append(elapsed)
+                else:
+                    # Failures count as a full timeout so they show in the tail
+                    self.samples.append(max(elapsed, self.timeout))
+                    self.errors += 1
+
+    def measure(self, until):
+        """Probe until ``until()`` returns True and report the latencies"""
+        self.samples, self.errors = [], 0
+        self._stop.clear()
+        threads = [threading.Thread(target=self._run, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        while not until():
+            time.sleep(0.1)
+        self._stop.set()
+        for thread in threads:
+            thread.join()
+        return dict(percentiles(self.samples), errors=self.errors)
+
+def run_upload(url, pdf_path, result, timeout):
+    start = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        response = requests.post(f"{url}/upload", files={"file": (os.path.basename(pdf_path), f)},
+                                 data={"bypass_cache": "true"}, timeout=timeout)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    result["submit_ms"] = round((time.perf_counter() - start) * 1e3, 1)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{url}/jobs/{job_id}", timeout=30).json()
+        if job["state"] in ("completed", "failed"):
+            result["state"] = job["state"]
+            break
+        time.sleep(0.5)
+    else:
+        result["state"] = "timeout"
+    result["seconds"] = round(time.perf_counter() - start, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--uploads", type=int, default=4, help="uploads submitted at once")
+    parser.add_argument("--pages", type=int, default=40, help="pages per synthetic PDF")
+    parser.add_argument("--pdf", help="upload an existing PDF instead of a synthetic one")
+    parser.add_argument("--concurrency", type=int, default=2, help="parallel /health probes")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    probe = HealthProbe(url, args.concurrency, timeout=10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "labels.pdf")
+            write_label_pdf(pdf_path, args.pages)
+
+        idle_until = time.time() + args.idle_seconds
+        idle = probe.measure(lambda: time.time() >= idle_until)
+
+        uploads = [{} for _ in range(args.uploads)]
+        threads = [threading.Thread(target=run_upload, args=(url, pdf_path, result, args.timeout), daemon=True)
+                   for result in uploads]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        loaded = probe.measure(lambda: not any(thread.is_alive() for thread in threads))
+        elapsed = time.perf_counter() - start
+
+    health = requests.get(f"{url}/health", timeout=10).json()
+    report = {
+        "url": url,
+        "uploads": args.uploads,
+        "pages_per_upload": args.pages if args.pdf is None else None,
+        "health_idle": idle,
+        "health_under_load": loaded,
+        "uploads_seconds": round(elapsed, 1),
+        "upload_results": uploads,
+        "background_workers": health.get("background_workers")
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic shipping-label PDFs for benchmarks
+
+Pages carry a small text content stream plus a grayscale image XObject so
+file size and parse cost resemble scanned label exports.
+"""
+import random
+
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+PAGE_WIDTH = 288   # 4 x 6 inch label
+PAGE_HEIGHT = 432
+
+def _font(writer):
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    return writer._add_object(font)
+
+def _image(writer, rng, width, height):
+    image = DecodedStreamObject()
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(width),
+        NameObject("/Height"): NumberObject(height),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    image.set_data(rng.randbytes(width * height))
+    return writer._add_object(image)
+
+def write_label_pdf(path, pages, image_size=(300, 400), seed=0):
+    """Write a ``pages``-page label PDF to ``path`` and return the path"""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = _font(writer)
+
+    for page_num in range(1, pages + 1):
+        page = PageObject.create_blank_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        order_id = 579199000000000000 + rng.randrange(10 ** 12)
+        text = (
+            f"BT /F1 10 Tf 20 400 Td (TikTok Shop  J&T EXPRESS) Tj ET\n"
+            f"BT /F1 10 Tf 20 380 Td (Order ID {order_id}) Tj ET\n"
+            f"BT /F1 10 Tf 20 360 Td (Shipping Date: 11/06/2025 23:59  page {page_num}) Tj ET\n"
+            f"q {PAGE_WIDTH - 40} 0 0 300 20 40 cm /Im1 Do Q\n"
+        )
+        content = DecodedStreamObject()
+        content.set_data(text.encode("latin-1"))
+
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+            NameObject("/XObject"): DictionaryObject({
+                NameObject("/Im1"): _image(writer, rng, *image_size)
+            }),
+        })
+        # add_page copies the page, so it must be complete before it's added
+        writer.add_page(page)
+
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
@@ -0,0 +1,221 @@
+import csv
+import io
+import itertools
+import logging
+import os
+import tempfile
+import threading
+
+from metrics import EXPORT_SECONDS
+from order_record import order_dict
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = 'ข้อมูลการจัดส่ง'
+
+COLUMNS = [
+    'เอกสาร', 'หน้า', 'ป้ายที่', 'Order ID', 'ชื่อผู้รับ', 'วันที่จัดส่ง', 'ที่อยู่เดิม', 'ที่อยู่ละเอียด',
+    'ตำบล', 'อำเภอ', 'จังหวัด', 'รหัสไปรษณีย์', 'COD', 'น้ำหนัก'
+]
+# Integer columns; the rest are text
+INTEGER_COLUMNS = {'หน้า', 'ป้ายที่'}
+# Only merged batch results record where each order was found
+SOURCES_COLUMN = 'แหล่งที่มา'
+
+# Parquet rows are buffered and written in row groups of this many orders
+PARQUET_ROW_GROUP = 10000
+
+def order_row(order, document='', with_sources=False):
+    """Flatten an order into values in COLUMNS order"""
+    address = order.get('parsed_address') or {}
+    row = [
+        order.get('document', document),
+        order['page'],
+        order.get('slot', 1),
+        order['order_id'],
+        order['recipient_name'],
+        order['shipping_date'],
+        order['recipient_address'],
+        address.get('street_address', ''),
+        address.get('subdistrict', ''),
+        address.get('district', ''),
+        address.get('province', ''),
+        address.get('postal_code', ''),
+        order.get('cod', ''),
+        order.get('weight', '')
+    ]
+    if with_sources:
+        sources = order.get('sources') or []
+        row.append('; '.join(
+            f"{source['document']} หน้า {source['page']}"
+            + (f" ป้ายที่ {source['slot']}" if source.get('slot', 1) > 1 else '')
+            for source in sources
+        ))
+    return row
+
+class ExcelExporter:
+    """Streams rows into an .xlsx with openpyxl's write-only mode
+
+    Rows are serialized as they are appended instead of being kept as
+    cell objects, so memory stays flat however many orders there are.
+    """
+
+    extension = 'xlsx'
+
+    def __init__(self, path, columns=COLUMNS):
+        # openpyxl takes ~100 ms to import, so it is loaded on the first export
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self.path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(SHEET_NAME)
+        bold = Font(bold=True)
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(self._sheet, value=name)
+            cell.font = bold
+            header.append(cell)
+        self._sheet.append(header)
+
+    def write(self, row):
+        self._sheet.append(row)
+
+    def close(self):
+        self._workbook.save(self.path)
+
+class CSVExporter:
+    """Writes rows straight to a UTF-8 CSV with a BOM so Excel reads the Thai text"""
+
+    extension = 'csv'
+
+    def __init__(self, path, columns=COLUMNS):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+class ParquetExporter:
+    """Writes rows to Parquet in row groups of PARQUET_ROW_GROUP orders (needs pyarrow)"""
+
+    extension = 'parquet'
+
+    def __init__(self, path, columns=COLUMNS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self._pa = pa
+        self._schema = pa.schema(
+            [(name, pa.int32() if name in INTEGER_COLUMNS else pa.string()) for name in columns]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._columns = [[] for _ in columns]
+
+    def write(self, row):
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        if len(self._columns[0]) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def _flush(self):
+        if self._columns[0]:
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(column, type=field.type) for column, field in zip(self._columns, self._schema)],
+                schema=self._schema
+            ))
+            self._columns = [[] for _ in self._schema]
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+EXPORTERS = {exporter.extension: exporter for exporter in (ExcelExporter, CSVExporter, ParquetExporter)}
+
+def available_formats():
+    """Export formats usable in this environment"""
+    return [extension for extension in EXPORTERS if extension != 'parquet' or parquet_available()]
+
+def write_export(results, path, extension):
+    """Write the orders in ``results`` to ``path`` in the given format"""
+    orders = results['extracted_orders']
+    with_sources = any(isinstance(order, dict) and 'sources' in order for order in orders)
+    return write_orders_export(orders, path, extension, results.get('document', ''), with_sources)
+
+def write_orders_export(orders, path, extension, document='', with_sources=None):
+    """Write ``orders``, any iterable, to ``path`` in the given format
+
+    Orders are written as they are iterated, so a generator reading them
+    from disk keeps memory flat. ``with_sources`` defaults to whether the
+    first order lists its sources, as every merged batch order does. The
+    file is written under a temporary name and renamed into place, so a
+    concurrent download never sees a half-written export.
+    """
+    orders = iter(orders)
+    first = next(orders, None)
+    if first is not None:
+        orders = itertools.chain([first], orders)
+    if with_sources is None:
+        with_sources = first is not None and 'sources' in order_dict(first)
+    columns = COLUMNS + [SOURCES_COLUMN] if with_sources else COLUMNS
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    exporter = EXPORTERS[extension](tmp_path, columns)
+    try:
+        with EXPORT_SECONDS.time(format=extension):
+            for order in orders:
+                exporter.write(order_row(order_dict(order), document, with_sources))
+            exporter.close()
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def export_bytes(results, extension):
+    """Build the export of ``results`` in memory and return it as a BytesIO
+
+    The file is written in a temporary directory that is removed again,
+    so nothing is left behind in the results folder.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = write_export(results, os.path.join(work_dir, f"export.{extension}"), extension)
+        with open(path, 'rb') as f:
+            return io.BytesIO(f.read())
+
+_export_locks = {}
+_export_locks_guard = threading.Lock()
+
+def ensure_export(orders_loader, path, extension):
+    """Create the export at ``path`` on first request, once per file
+
+    ``orders_loader`` is only called when the file has to be built, and
+    returns the orders and document name for write_orders_export.
+    Concurrent requests for the same file wait for the first one.
+    """
+    if os.path.exists(path):
+        return path
+    with _export_locks_guard:
+        lock = _export_locks.setdefault(path, threading.Lock())
+    with lock:
+        if not os.path.exists(path):
+            logger.info(f"Building {extension} export {path}")
+            orders, document = orders_loader()
+            write_orders_export(orders, path, extension, document)
+    with _export_locks_guard:
+        _export_locks.pop(path, None)
+    return path
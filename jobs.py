@@ -0,0 +1,607 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ('queued', 'running', 'completed', 'failed')
+
+# Stored as the index; queued jobs are claimed highest priority first
+JOB_PRIORITIES = ('low', 'normal', 'high')
+DEFAULT_PRIORITY = JOB_PRIORITIES.index('normal')
+
+def parse_priority_weights(spec):
+    """Parse ``"low,normal,high"`` fair-queuing weights, one positive number per priority"""
+    try:
+        weights = [float(value) for value in spec.split(',')]
+    except ValueError:
+        weights = []
+    if len(weights) != len(JOB_PRIORITIES) or not all(weight > 0 for weight in weights):
+        raise ValueError(
+            f"Invalid priority weights {spec!r}: expected {len(JOB_PRIORITIES)} positive numbers "
+            f"for {', '.join(JOB_PRIORITIES)}, e.g. 1,2,4"
+        )
+    return weights
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    options TEXT NOT NULL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER NOT NULL DEFAULT 0,
+    orders_found INTEGER NOT NULL DEFAULT 0,
+    results TEXT,
+    download_urls TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs (state, created_at);
+CREATE TABLE IF NOT EXISTS job_orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    order_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_orders_job_seq ON job_orders (job_id, seq);
+CREATE TABLE IF NOT EXISTS job_pages (
+    job_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    markdown TEXT,
+    order_data TEXT,
+    page_info TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (job_id, page)
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    options TEXT NOT NULL,
+    results TEXT,
+    download_urls TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Columns added to the jobs table after its first release
+JOB_COLUMN_MIGRATIONS = {
+    'batch_id': 'TEXT',
+    'attempts': 'INTEGER NOT NULL DEFAULT 0',
+    'priority': f'INTEGER NOT NULL DEFAULT {DEFAULT_PRIORITY}',
+    'heartbeat_at': 'TEXT'
+}
+
+def new_job_id():
+    """Generate a new unique job ID"""
+    return uuid.uuid4().hex
+
+def _now():
+    return datetime.now().isoformat()
+
+class JobStore:
+    """Persistent SQLite-backed queue of upload processing jobs
+
+    Every call opens its own connection, so a single store can be shared
+    between request handlers and background worker threads (and between
+    processes pointing at the same database file).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        # Several server processes may open the store at once; only one may alter it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in JOB_COLUMN_MIGRATIONS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_state_priority ON jobs (state, priority DESC, created_at)"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def _connect(self):
+        # One long-lived connection per thread. Opening a connection per call let the
+        # last one to close checkpoint and delete the WAL, and concurrent openers
+        # (other threads and server processes) stalled in the busy handler meanwhile.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    def _row_to_job(self, row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"]) if job["options"] else {}
+        job["results"] = json.loads(job["results"]) if job["results"] else None
+        job["download_urls"] = json.loads(job["download_urls"]) if job["download_urls"] else None
+        return job
+
+    def create_job(self, job_id, filename, filepath, options=None, batch_id=None, priority=DEFAULT_PRIORITY):
+        """Enqueue a new job and return its ID"""
+        now = _now()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, state, filename, filepath, options, batch_id, priority, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, filepath, json.dumps(options or {}), batch_id, priority, now, now)
+            )
+        logger.info(f"Job {job_id} queued for {filename}")
+        return job_id
+
+    def claim_next_job(self):
+        """Atomically move the oldest queued job of the highest priority to running and return it"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE state = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    now = _now()
+                    conn.execute(
+                        "UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = ?, "
+                        "heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                        (now, now, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+
+        job = self._row_to_job(row)
+        job["state"] = "running"
+        job["attempts"] += 1
+        job["started_at"] = job["heartbeat_at"] = now
+        return job
+
+    def heartbeat(self, job_ids):
+        """Record that the worker running these jobs is still alive"""
+        if not job_ids:
+            return
+        placeholders = ', '.join('?' * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE state = 'running' AND id IN ({placeholders})",
+                (_now(), *job_ids)
+            )
+
+    def requeue_stale_jobs(self, stale_seconds, max_attempts):
+        """Requeue running jobs whose worker stopped sending heartbeats
+
+        A job is stale once its worker hasn't sent a heartbeat (see
+        JobWorkerPool) for ``stale_seconds``, which happens when the worker
+        process died. It goes back to the queue, where it resumes from its
+        page checkpoints, unless it has already been tried ``max_attempts``
+        times, in which case it fails. Returns ``(requeued, failed)``: the
+        number of jobs requeued and the jobs failed, which the caller must
+        finish like any other failed job.
+        """
+        now = _now()
+        cutoff = (datetime.now() - timedelta(seconds=stale_seconds)).isoformat()
+        error = f"Worker stopped responding after {max_attempts} attempts"
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                requeued = conn.execute(
+                    "UPDATE jobs SET state = 'queued', updated_at = ? "
+                    "WHERE state = 'running' AND COALESCE(heartbeat_at, updated_at) < ? AND attempts < ?",
+                    (now, cutoff, max_attempts)
+                ).rowcount
+                failed = conn.execute(
+                    "SELECT * FROM jobs WHERE state = 'running' AND COALESCE(heartbeat_at, updated_at) < ?",
+                    (cutoff,)
+                ).fetchall()
+                for row in failed:
+                    self._fail(conn, row["id"], error, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if requeued or failed:
+            logger.warning(f"Requeued {requeued} stale job(s), failed {len(failed)} after {max_attempts} attempts")
+        return requeued, [dict(self._row_to_job(row), state='failed', error=error) for row in failed]
+
+    def retry_job(self, job_id):
+        """Queue a failed job again; it resumes from its page checkpoints. Returns False if not failed"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'queued', error = NULL, finished_at = NULL, updated_at = ? "
+                "WHERE id = ? AND state = 'failed'",
+                (_now(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def save_page(self, job_id, page, page_info, orders=(), markdown=None):
+        """Checkpoint a finished page and its orders so a resumed job doesn't process it again"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_pages (job_id, page, markdown, order_data, page_info, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, page, markdown,
+                    json.dumps(list(orders), ensure_ascii=False),
+                    json.dumps(page_info, ensure_ascii=False),
+                    _now()
+                )
+            )
+
+    def get_pages(self, job_id):
+        """Return a job's checkpointed pages as ``{page: {"orders", "page_info", "markdown"}}``"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT page, markdown, order_data, page_info FROM job_pages WHERE job_id = ? ORDER BY page",
+                (job_id,)
+            ).fetchall()
+        return {
+            row["page"]: {
+                "orders": json.loads(row["order_data"]) if row["order_data"] is not None else [],
+                "page_info": json.loads(row["page_info"]),
+                "markdown": row["markdown"]
+            }
+            for row in rows
+        }
+
+    def update_progress(self, job_id, pages_done, pages_total, orders_found):
+        """Record page progress for a running job"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET pages_done = ?, pages_total = ?, orders_found = ?, updated_at = ? "
+                "WHERE id = ?",
+                (pages_done, pages_total, orders_found, _now(), job_id)
+            )
+
+    def complete_job(self, job_id, results, download_urls):
+        """Mark a job as completed, store its results and drop its page checkpoints"""
+        now = _now()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET state = 'completed', results = ?, download_urls = ?, "
+                    "orders_found = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (
+                        json.dumps(results, ensure_ascii=False),
+                        json.dumps(download_urls),
+                        results["orders_found"],
+                        now, now, job_id
+                    )
+                )
+                conn.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _fail(self, conn, job_id, error, now):
+        conn.execute(
+            "UPDATE jobs SET state = 'failed', error = ?, finished_at = ?, updated_at = ? "
+            "WHERE id = ?",
+            (str(error), now, now, job_id)
+        )
+
+    def fail_job(self, job_id, error):
+        """Mark a job as failed"""
+        with self._connect() as conn:
+            self._fail(conn, job_id, error, _now())
+
+    def add_order(self, job_id, order_data):
+        """Append an extracted order to a running job as soon as it is parsed"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_orders (job_id, page, order_data) VALUES (?, ?, ?)",
+                (job_id, order_data.get("page", 0), json.dumps(order_data, ensure_ascii=False))
+            )
+
+    def discard_unsaved_orders(self, job_id):
+        """Drop orders recorded for pages without a checkpoint, before a job resumes and redoes them"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM job_orders WHERE job_id = ? AND page NOT IN "
+                "(SELECT page FROM job_pages WHERE job_id = ?)",
+                (job_id, job_id)
+            )
+
+    def prune_orders(self, max_age_seconds):
+        """Delete the streamed orders of jobs completed more than ``max_age_seconds`` ago
+
+        The rows only feed the job event stream; completed jobs keep their
+        orders in their result files and the order store. Failed jobs keep
+        theirs for a retry to resume with until prune_failed_checkpoints.
+        Returns the number of rows deleted.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM job_orders WHERE job_id IN ("
+                "    SELECT id FROM jobs WHERE state = 'completed' AND finished_at < ?"
+                ")",
+                (cutoff,)
+            ).rowcount
+
+    def prune_failed_checkpoints(self, max_age_seconds):
+        """Delete the page checkpoints and streamed orders of jobs failed more than ``max_age_seconds`` ago
+
+        A job retried after this redoes every page. Returns the number of
+        rows deleted.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
+        failed = "SELECT id FROM jobs WHERE state = 'failed' AND finished_at < ?"
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = conn.execute(f"DELETE FROM job_pages WHERE job_id IN ({failed})", (cutoff,)).rowcount
+                deleted += conn.execute(f"DELETE FROM job_orders WHERE job_id IN ({failed})", (cutoff,)).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def get_orders(self, job_id, after_seq=0):
+        """Return ``(seq, order_data)`` pairs recorded for a job after ``after_seq``"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, order_data FROM job_orders WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [(row["seq"], json.loads(row["order_data"])) for row in rows]
+
+    def get_job(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def active_filepaths(self):
+        """Return the upload paths of jobs that are queued or running"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT filepath FROM jobs WHERE state IN ('queued', 'running')").fetchall()
+        return {row["filepath"] for row in rows}
+
+    def count_by_state(self):
+        """Return the number of jobs in each state"""
+        counts = {state: 0 for state in JOB_STATES}
+        with self._connect() as conn:
+            for row in conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"):
+                counts[row["state"]] = row["n"]
+        return counts
+
+    def _row_to_batch(self, row):
+        batch = dict(row)
+        batch["options"] = json.loads(batch["options"]) if batch["options"] else {}
+        batch["results"] = json.loads(batch["results"]) if batch["results"] else None
+        batch["download_urls"] = json.loads(batch["download_urls"]) if batch["download_urls"] else None
+        return batch
+
+    def create_batch(self, batch_id, documents, options=None, priority=DEFAULT_PRIORITY):
+        """Create a batch and enqueue one job per ``(job_id, filename, filepath)``
+
+        The batch and its jobs are inserted in one transaction so no worker
+        can finish the batch before every job has been queued.
+        """
+        now = _now()
+        options_json = json.dumps(options or {})
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO batches (id, state, options, created_at, updated_at) "
+                    "VALUES (?, 'running', ?, ?, ?)",
+                    (batch_id, options_json, now, now)
+                )
+                conn.executemany(
+                    "INSERT INTO jobs (id, state, filename, filepath, options, batch_id, priority, created_at, updated_at) "
+                    "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (job_id, filename, filepath, options_json, batch_id, priority, now, now)
+                        for job_id, filename, filepath in documents
+                    ]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Batch {batch_id} queued with {len(documents)} document(s)")
+        return batch_id
+
+    def get_batch(self, batch_id):
+        """Return a batch as a dict, or None if it does not exist"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return self._row_to_batch(row) if row else None
+
+    def get_batch_jobs(self, batch_id):
+        """Return every job in a batch, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid", (batch_id,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim_batch_merge(self, batch_id):
+        """Move a batch to merging once all of its jobs have finished
+
+        Returns True for exactly one caller, which is then responsible for
+        completing or failing the batch.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE batches SET state = 'merging', updated_at = ? "
+                "WHERE id = ? AND state = 'running' AND NOT EXISTS ("
+                "    SELECT 1 FROM jobs WHERE batch_id = ? AND state IN ('queued', 'running')"
+                ")",
+                (_now(), batch_id, batch_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete_batch(self, batch_id, results, download_urls):
+        """Mark a batch as completed and store its merged results"""
+        now = _now()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE batches SET state = 'completed', results = ?, download_urls = ?, "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(results, ensure_ascii=False), json.dumps(download_urls), now, now, batch_id)
+            )
+
+    def fail_batch(self, batch_id, error):
+        """Mark a batch as failed"""
+        now = _now()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE batches SET state = 'failed', error = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (str(error), now, now, batch_id)
+            )
+
+class JobWorkerPool:
+    """Background threads that claim queued jobs and run them through a handler
+
+    The handler is called as ``handler(job)`` and must return a
+    ``(results, download_urls)`` tuple, with the number of orders in
+    ``results["orders_found"]``; any exception fails the job. If
+    given, ``on_finished(job)`` runs after a job completes or fails.
+    While a job runs, a heartbeat thread stamps it every quarter of
+    ``stale_seconds``, however long its pages take. Running jobs without
+    a heartbeat for ``stale_seconds`` (their worker died) are requeued at
+    start and then every ``stale_seconds / 2`` (at most a minute), up to
+    ``max_attempts`` runs per job; after that they fail and are finished
+    like any other failed job.
+    """
+
+    STALE_CHECK_INTERVAL = 60
+
+    def __init__(self, store, handler, num_workers=1, poll_interval=2.0, on_finished=None,
+                 stale_seconds=600, max_attempts=3):
+        self.store = store
+        self.handler = handler
+        self.on_finished = on_finished
+        self.num_workers = max(1, num_workers)
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.heartbeat_interval = stale_seconds / 4
+        self.stale_check_interval = min(self.STALE_CHECK_INTERVAL, stale_seconds / 2)
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_stale_check = None
+        self._running = set()
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._send_heartbeats, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.num_workers} job worker(s)")
+
+    def notify(self):
+        """Wake idle workers after a job has been enqueued"""
+        self._wakeup.set()
+
+    def _send_heartbeats(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._running)
+            try:
+                self.store.heartbeat(job_ids)
+            except Exception as e:
+                logger.error(f"Failed to record job heartbeat: {e}")
+
+    def _requeue_stale(self):
+        with self._lock:
+            if (self._last_stale_check is not None
+                    and time.monotonic() - self._last_stale_check < self.stale_check_interval):
+                return
+            self._last_stale_check = time.monotonic()
+        try:
+            _, failed = self.store.requeue_stale_jobs(self.stale_seconds, self.max_attempts)
+        except Exception as e:
+            logger.error(f"Failed to requeue stale jobs: {e}")
+            return
+        for job in failed:
+            self._finished(job)
+
+    def _finished(self, job):
+        if self.on_finished:
+            try:
+                self.on_finished(job)
+            except Exception as e:
+                logger.error(f"Post-processing for job {job['id']} failed: {e}")
+
+    def _run(self):
+        while True:
+            self._requeue_stale()
+            try:
+                job = self.store.claim_next_job()
+            except Exception as e:
+                logger.error(f"Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            logger.info(f"Job {job['id']} started: {job['filename']}")
+            with self._lock:
+                self._running.add(job["id"])
+            try:
+                results, download_urls = self.handler(job)
+                self.store.complete_job(job["id"], results, download_urls)
+                logger.info(f"Job {job['id']} completed")
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                self.store.fail_job(job["id"], e)
+            finally:
+                with self._lock:
+                    self._running.discard(job["id"])
+
+            self._finished(job)
@@ -0,0 +1,270 @@
+import re
+
+# All patterns are compiled once at import and only ever applied to a single
+# line, so parsing is linear in the length of the OCR text.
+RECIPIENT_RE = re.compile(r'ถึง(?:\s+(.*)|\s*$)')
+ORDER_ID_RE = re.compile(r'order\s*id\s*:?\s*(\d*)', re.IGNORECASE)
+SHIPPING_DATE_RE = re.compile(r'shipping\s*date\s*:?\s*(.*)', re.IGNORECASE)
+COD_RE = re.compile(r'\bCOD\b\s*:?\s*(?:฿|THB|บาท)?\s*([\d,]+(?:\.\d+)?)?', re.IGNORECASE)
+WEIGHT_RE = re.compile(r'weight\s*:?\s*([\d.,]+\s*(?:kg|g|กก\.?|กรัม)?)?', re.IGNORECASE)
+LEADING_DIGITS_RE = re.compile(r'\d+')
+AMOUNT_RE = re.compile(r'(?:฿|THB|บาท)?\s*([\d,]+(?:\.\d+)?)')
+WEIGHT_VALUE_RE = re.compile(r'[\d.,]+\s*(?:kg|g|กก\.?|กรัม)?', re.IGNORECASE)
+POSTAL_CODE_RE = re.compile(r'(?<!\d)\d{5}(?!\d)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Lines that end the recipient address block
+ADDRESS_STOP_RE = re.compile(r'(?:\(\+\)|COD\b|Weight|Order|Shipping\s*Date)', re.IGNORECASE)
+
+# Markdown decoration Typhoon OCR may put around a line
+MARKDOWN_STRIP = ' \t*#>|'
+
+# Markdown table rows, the separator row under a table header and line breaks inside cells
+TABLE_ROW_RE = re.compile(r'^\s*\|(.*)\|\s*$')
+TABLE_SEPARATOR_RE = re.compile(r'^[\s|:-]+$')
+CELL_BREAK_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+# Fields printed once per label; seeing one again means the next label has started
+LABEL_START_PATTERNS = (("recipient_name", RECIPIENT_RE), ("order_id", ORDER_ID_RE), ("shipping_date", SHIPPING_DATE_RE))
+
+def empty_label():
+    """Return a label dict with every field blank"""
+    return {
+        "recipient_name": "",
+        "recipient_address": "",
+        "order_id": "",
+        "shipping_date": "",
+        "cod": "",
+        "weight": ""
+    }
+
+def _clean(line):
+    return line.replace('**', '').strip(MARKDOWN_STRIP)
+
+def parse_label(text):
+    """Extract label fields from OCR text in a single pass over its lines
+
+    Returns the first recipient, order ID, shipping date, COD amount and
+    weight found. A field label whose value is missing on the same line
+    takes its value from the next non-empty line.
+    """
+    label = empty_label()
+    address_lines = []
+    # Field waiting for its value on the next non-empty line
+    pending = None
+    in_address = False
+
+    for raw_line in text.splitlines():
+        line = _clean(raw_line)
+
+        if in_address:
+            if not line or ADDRESS_STOP_RE.match(line):
+                in_address = False
+            else:
+                address_lines.append(line)
+                continue
+
+        if not line:
+            continue
+
+        if pending is not None:
+            field, pending = pending, None
+            if field == "recipient_name":
+                label["recipient_name"] = line
+                in_address = True
+                continue
+            if field == "order_id":
+                match = LEADING_DIGITS_RE.match(line)
+                if match:
+                    label["order_id"] = match.group()
+                    continue
+            elif field == "shipping_date":
+                label["shipping_date"] = line
+                continue
+            elif field == "cod":
+                match = AMOUNT_RE.match(line)
+                if match:
+                    label["cod"] = match.group(1)
+                    continue
+            elif field == "weight":
+                match = WEIGHT_VALUE_RE.match(line)
+                if match:
+                    label["weight"] = match.group().strip()
+                    continue
+
+        if not label["recipient_name"]:
+            match = RECIPIENT_RE.search(line)
+            if match:
+                name = (match.group(1) or '').strip()
+                if name:
+                    label["recipient_name"] = name
+                    in_address = True
+                else:
+                    pending = "recipient_name"
+                continue
+
+        if not label["order_id"]:
+            match = ORDER_ID_RE.search(line)
+            if match:
+                if match.group(1):
+                    label["order_id"] = match.group(1)
+                else:
+                    pending = "order_id"
+                continue
+
+        if not label["shipping_date"]:
+            match = SHIPPING_DATE_RE.search(line)
+            if match:
+                value = match.group(1).strip()
+                if value:
+                    label["shipping_date"] = value
+                else:
+                    pending = "shipping_date"
+                continue
+
+        if not label["cod"]:
+            match = COD_RE.search(line)
+            if match:
+                if match.group(1):
+                    label["cod"] = match.group(1)
+                else:
+                    pending = "cod"
+                continue
+
+        if not label["weight"]:
+            match = WEIGHT_RE.search(line)
+            if match:
+                if match.group(1):
+                    label["weight"] = match.group(1).strip()
+                else:
+                    pending = "weight"
+                continue
+
+    label["recipient_address"] = WHITESPACE_RE.sub(' ', ' '.join(address_lines)).strip()
+    return label
+
+def _label_start(line):
+    """Return ``(field, value)`` for the first once-per-label field on a line, or None"""
+    for field, pattern in LABEL_START_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            return field, (match.group(1) or '').strip()
+    return None
+
+def _next_values(lines):
+    """Order ID each line's next non-empty line starts with, as parse_label reads a value-less heading
+
+    Built in one backward pass, so looking up every heading stays linear.
+    """
+    values = [''] * len(lines)
+    value = ''
+    for index in range(len(lines) - 1, -1, -1):
+        values[index] = value
+        line = _clean(lines[index])
+        if line:
+            match = LEADING_DIGITS_RE.match(line)
+            value = match.group() if match else ''
+    return values
+
+def _split_lines(lines):
+    """Split consecutive lines into label blocks wherever a once-per-label field repeats"""
+    blocks = [[]]
+    seen = {}
+    next_values = None
+    for index, line in enumerate(lines):
+        start = _label_start(_clean(line))
+        if start is not None:
+            field, value = start
+            if field == "order_id" and not value:
+                if next_values is None:
+                    next_values = _next_values(lines)
+                value = next_values[index]
+            # The same order ID printed twice (e.g. under a barcode) is still one label
+            if field in seen and not (field == "order_id" and value and value == seen[field]):
+                blocks.append([])
+                seen = {}
+            seen[field] = value
+        blocks[-1].append(line)
+    return blocks
+
+def _table_labels(rows):
+    """Label blocks of a markdown table whose columns hold separate labels, else None
+
+    Each column is read top to bottom and split into labels, which are
+    then put in reading order: by the row they start on, then by column.
+    """
+    columns = []
+    for row_index, row in enumerate(rows):
+        for column_index, cell in enumerate(row):
+            if column_index == len(columns):
+                columns.append([])
+            columns[column_index].extend((row_index, line) for line in CELL_BREAK_RE.split(cell))
+    labels = sum(1 for column in columns if any(_label_start(_clean(line)) for _, line in column))
+    # A table of field names and values is one label, not a label per column
+    if labels < 2:
+        return None
+
+    blocks = []
+    for column_index, column in enumerate(columns):
+        rows_of = dict(enumerate(row_index for row_index, _ in column))
+        offset = 0
+        for block in _split_lines([line for _, line in column]):
+            blocks.append((rows_of.get(offset, 0), column_index, block))
+            offset += len(block)
+    blocks.sort(key=lambda item: item[:2])
+    return [block for _, _, block in blocks]
+
+def split_labels(text):
+    """Split OCR text of a page into one text per label printed on it
+
+    Labels printed side by side (2-up or 4-up sheets) come back from OCR
+    as a markdown table with a label per column, so each such column is
+    read as its own run of lines. Runs of lines are split wherever the
+    recipient, order ID or shipping date shows up a second time. A page
+    with one label comes back as a single text.
+    """
+    blocks = []
+    run = []
+    table = []
+
+    def end_table():
+        labels = _table_labels([row for _, row in table])
+        if labels is None:
+            run.extend(line for line, _ in table)
+        else:
+            blocks.extend(_split_lines(run))
+            blocks.extend(labels)
+            run.clear()
+        table.clear()
+
+    for line in text.splitlines():
+        match = TABLE_ROW_RE.match(line)
+        if match:
+            if not TABLE_SEPARATOR_RE.match(line):
+                table.append((line, [cell.strip() for cell in match.group(1).split('|')]))
+            continue
+        if table:
+            end_table()
+        run.append(line)
+    if table:
+        end_table()
+    blocks.extend(_split_lines(run))
+
+    texts = ['\n'.join(block) for block in blocks]
+    return [block for block in texts if block.strip()] or [text]
+
+def parse_labels(text):
+    """Parse every label on a page, in the order they appear; see split_labels"""
+    return [parse_label(block) for block in split_labels(text)]
+
+def parse_address(raw_address):
+    """Split a raw address into street, district, province and postal code"""
+    parts = [part.strip() for part in raw_address.split(',') if part.strip()]
+    postal_match = POSTAL_CODE_RE.search(raw_address)
+    return {
+        "full_address": raw_address,
+        "street_address": parts[0] if len(parts) > 0 else "",
+        "district": parts[1] if len(parts) > 1 else "",
+        "province": parts[2] if len(parts) > 2 else "",
+        "postal_code": postal_match.group() if postal_match else ""
+    }
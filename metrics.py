@@ -0,0 +1,200 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond parsing up to multi-minute jobs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format
+
+    A small subset of prometheus_client (counters, histograms and
+    scrape-time callbacks, with labels) so the service needs no extra
+    dependency. Values are per process.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total", tuple(zip(self.labelnames, key)), value
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (bucket_counts, count, total) in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(float(bound))),), cumulative
+            yield f"{self.name}_bucket", labels + (("le", "+Inf"),), count
+            yield f"{self.name}_count", labels, count
+            yield f"{self.name}_sum", labels, total
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from ``func`` at scrape time
+
+    ``func`` returns ``{labels_tuple: value}`` with label values in
+    ``labelnames`` order (an empty tuple for an unlabelled metric).
+    """
+
+    def __init__(self, name, help, func, labelnames=(), type='gauge', registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def samples(self):
+        name = f"{self.name}_total" if self.type == 'counter' else self.name
+        try:
+            values = self.func()
+        except Exception:
+            # A broken callback must not take the whole scrape down
+            return
+        for key, value in values.items():
+            yield name, tuple(zip(self.labelnames, key)), value
+
+# Pipeline metrics
+
+STAGE_SECONDS = Histogram(
+    'ocr_pipeline_stage_seconds',
+    'Time spent in each processing stage (per page for page stages, per job otherwise)',
+    ['stage']
+)
+EXPORT_SECONDS = Histogram('ocr_export_seconds', 'Time to write a result file', ['format'])
+QUEUE_WAIT_SECONDS = Histogram(
+    'ocr_job_queue_wait_seconds', 'Time jobs spend queued before a worker claims them, by priority', ['priority']
+)
+JOB_SECONDS = Histogram('ocr_job_duration_seconds', 'Time from a job being claimed to finishing', ['state'])
+HTTP_REQUEST_SECONDS = Histogram(
+    'ocr_http_request_seconds', 'HTTP request latency until the response starts', ['endpoint', 'method', 'status']
+)
+
+PAGES = Counter('ocr_pages', 'Pages handled, by outcome', ['outcome'])
+ORDERS = Counter('ocr_orders_extracted', 'Orders extracted from pages')
+JOBS = Counter('ocr_jobs', 'Jobs finished, by final state', ['state'])
+
+class JobTimings:
+    """Per-job sums of stage durations, reported in the results in debug mode"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                stage: {"count": count, "total_ms": round(total * 1000, 2), "max_ms": round(longest * 1000, 2)}
+                for stage, (count, total, longest) in self._stages.items()
+            }
+
+@contextmanager
+def timed(stage, timings=None):
+    """Time a block into STAGE_SECONDS and, if given, a job's JobTimings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings.record(stage, elapsed)
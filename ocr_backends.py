@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+class OCRBackendError(Exception):
+    """Raised when an OCR backend fails to return text for a page
+
+    ``retryable`` marks failures worth retrying (rate limits, timeouts,
+    server errors) as opposed to ones that will fail again, and
+    ``retry_after`` carries the delay in seconds the API asked for, if any.
+    """
+
+    def __init__(self, message, status_code=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+def _is_retryable_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+def _parse_retry_after(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        # HTTP-date form; let the client fall back to its own backoff
+        return None
+
+# Simple mock OCR function for testing
+def mock_ocr_document(pdf_path, page_num=1):
+    """Mock OCR function for testing when typhoon-ocr is not available"""
+    logger.info(f"Mock OCR processing page {page_num} of {pdf_path}")
+
+    # Return mock data that matches expected format
+    return """
+TikTok Shop
+
+J&T EXPRESS
+
+ถึง ทดสอบ ผู้รับ
+123/45 ม.6 ต.ทดสอบ อ.ทดสอบ จ.ทดสอบ, ทดสอบ, ทดสอบ, 12345
+
+Order ID
+123456789
+
+Shipping Date:
+11/06/2025 23:59
+"""
+
+class OCRBackend:
+    """Interface every OCR backend implements
+
+    ``ocr_page`` receives an open PDFDocument and a 1-based page number
+    and returns the page text as markdown. ``image`` is the page already
+    rendered to PNG by the pre-OCR stage, when enabled; backends send it
+    instead of the PDF page.
+    """
+
+    name = "base"
+
+    def ocr_page(self, document, page_num, task_type="default", image=None):
+        raise NotImplementedError
+
+    def describe(self):
+        """Return backend settings for /health"""
+        return {"name": self.name}
+
+class MockOCRBackend(OCRBackend):
+    """Returns a fixed label instantly, or after ``latency_ms`` to mimic a real API"""
+
+    name = "mock"
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+
+    def ocr_page(self, document, page_num, task_type="default", image=None):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return mock_ocr_document(document.path, page_num)
+
+    def describe(self):
+        return {"name": self.name, "latency_ms": self.latency_ms}
+
+class TyphoonOCRBackend(OCRBackend):
+    """OCR through the Typhoon OCR API with one pooled OpenAI client
+
+    Messages are built with typhoon-ocr's prompt and page rendering
+    helpers, as its ``ocr_document`` does, but every call goes through the
+    same client, so connections are kept alive and reused across pages.
+    The client's own retries are off; OCRClient retries instead, so every
+    429 reaches its concurrency limiter and throttle counts.
+    """
+
+    name = "typhoon"
+
+    DEFAULT_BASE_URL = 'https://api.opentyphoon.ai/v1'
+    DEFAULT_MODEL = 'typhoon-ocr'
+
+    def __init__(self, api_key=None, model=None, base_url=None, pool_size=10):
+        # Imported here so the mock and HTTP backends don't need typhoon-ocr installed
+        import openai
+        from typhoon_ocr import prepare_ocr_messages
+
+        self._openai = openai
+        self._prepare_ocr_messages = prepare_ocr_messages
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        # One keep-alive connection per concurrent OCR call; Limits comes from
+        # whichever httpx package this openai release is built on
+        limits = type(openai.DEFAULT_CONNECTION_LIMITS)(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client = openai.OpenAI(
+            api_key=api_key or os.environ.get('TYPHOON_API_KEY') or os.environ.get('OPENAI_API_KEY') or '',
+            base_url=base_url or self.DEFAULT_BASE_URL,
+            max_retries=0,
+            http_client=openai.DefaultHttpxClient(limits=limits)
+        )
+
+    def ocr_page(self, document, page_num, task_type="default", image=None):
+        if image is not None:
+            # typhoon-ocr only reads from paths, so the rendered page goes through a temp file
+            with tempfile.NamedTemporaryFile(suffix='.png') as f:
+                f.write(image)
+                f.flush()
+                return self._call(f.name, task_type, 1)
+        return self._call(document.path, task_type, page_num)
+
+    def _call(self, path, task_type, page_num):
+        try:
+            messages = self._prepare_ocr_messages(pdf_or_image_path=path, task_type=task_type, page_num=page_num)
+        except ValueError as e:
+            raise OCRBackendError(f"Typhoon OCR could not read page {page_num}: {e}") from e
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model or self.DEFAULT_MODEL,
+                messages=messages,
+                max_tokens=16384,
+                extra_body={
+                    "repetition_penalty": 1.1 if task_type == "v1.5" else 1.2,
+                    "temperature": 0.1,
+                    "top_p": 0.6
+                }
+            )
+        except self._openai.APIStatusError as e:
+            raise OCRBackendError(
+                f"Typhoon OCR returned {e.status_code}",
+                status_code=e.status_code,
+                retryable=_is_retryable_status(e.status_code),
+                retry_after=_parse_retry_after(e.response.headers.get('Retry-After'))
+            ) from e
+        except self._openai.APIConnectionError as e:
+            # Also covers APITimeoutError
+            raise OCRBackendError(f"Typhoon OCR request failed: {e}", retryable=True) from e
+
+        text = response.choices[0].message.content
+        if task_type == "v1.5":
+            return text
+        # Other prompts ask for JSON with the page text under natural_text
+        try:
+            return json.loads(text)['natural_text']
+        except (TypeError, ValueError, KeyError) as e:
+            raise OCRBackendError(f"Typhoon OCR returned unexpected output: {e}") from e
+
+    def describe(self):
+        return {"name": self.name, "model": self.model or self.DEFAULT_MODEL, "api_key_set": bool(self.api_key)}
+
+class HTTPOCRBackend(OCRBackend):
+    """OCR by POSTing each single-page PDF to an HTTP service
+
+    Speaks the protocol of ocr_standin_server.py: the single-page PDF (or
+    rendered PNG) goes in the request body and the response is
+    ``{"markdown": "..."}``.
+    """
+
+    name = "http"
+
+    def __init__(self, url, timeout=60, pool_size=10):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        import requests
+
+        # One keep-alive connection per concurrent OCR call
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def ocr_page(self, document, page_num, task_type="default", image=None):
+        import requests
+
+        if image is not None:
+            body, content_type = image, "image/png"
+        else:
+            body, content_type = document.page_bytes(page_num), "application/pdf"
+        try:
+            response = self._session.post(
+                f"{self.url}/ocr",
+                params={"task_type": task_type, "page_num": page_num},
+                data=body,
+                headers={"Content-Type": content_type},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise OCRBackendError(f"OCR request failed: {e}", retryable=True) from e
+
+        if response.status_code != 200:
+            raise OCRBackendError(
+                f"OCR service returned {response.status_code}",
+                status_code=response.status_code,
+                retryable=_is_retryable_status(response.status_code),
+                retry_after=_parse_retry_after(response.headers.get('Retry-After'))
+            )
+        return response.json()["markdown"]
+
+    def describe(self):
+        return {"name": self.name, "url": self.url}
+
+def create_backend(name=None, pool_size=10):
+    """Build the OCR backend selected by OCR_BACKEND (mock, typhoon or http)"""
+    name = (name or os.environ.get('OCR_BACKEND', 'mock')).lower()
+
+    if name == 'mock':
+        return MockOCRBackend(latency_ms=float(os.environ.get('MOCK_OCR_LATENCY_MS', '0')))
+    if name == 'typhoon':
+        return TyphoonOCRBackend(
+            api_key=os.environ.get('TYPHOON_OCR_API_KEY'),
+            model=os.environ.get('TYPHOON_OCR_MODEL'),
+            base_url=os.environ.get('TYPHOON_BASE_URL'),
+            pool_size=pool_size
+        )
+    if name == 'http':
+        return HTTPOCRBackend(
+            os.environ.get('OCR_HTTP_URL', 'http://127.0.0.1:8090'),
+            timeout=float(os.environ.get('OCR_HTTP_TIMEOUT', '60')),
+            pool_size=pool_size
+        )
+    raise ValueError(f"Unknown OCR_BACKEND: {name}")
@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    key TEXT PRIMARY KEY,
+    markdown TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache (last_used_at);
+CREATE TABLE IF NOT EXISTS ocr_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO ocr_cache_stats (name, value) VALUES ('hits', 0), ('misses', 0);
+"""
+
+# Run eviction after this many inserts
+EVICT_EVERY = 50
+
+class OCRCache:
+    """Persistent cache of OCR output keyed by page content and task type
+
+    Entries older than ``max_age_seconds`` are treated as misses and
+    removed, and the least recently used entries are evicted once the
+    cache holds more than ``max_entries`` pages. Hit/miss counters are
+    stored alongside the entries so they survive restarts.
+    """
+
+    def __init__(self, db_path, max_entries=10000, max_age_seconds=30 * 24 * 3600):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._puts = 0
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        self.evict()
+
+    @contextmanager
+    def _connect(self):
+        # One long-lived connection per thread, for the reasons given in JobStore._connect
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    @staticmethod
+    def make_key(page_bytes, task_type="default", backend=""):
+        """Build a cache key from a single page's PDF bytes, the OCR task type and backend"""
+        digest = hashlib.sha256(page_bytes)
+        digest.update(b"\0" + task_type.encode("utf-8"))
+        if backend:
+            # Mock and stand-in output must never be served in place of real OCR
+            digest.update(b"\0" + backend.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached OCR text for ``key``, or None on a miss"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT markdown, created_at FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                conn.execute("UPDATE ocr_cache_stats SET value = value + 1 WHERE name = 'misses'")
+                return None
+
+            conn.execute("UPDATE ocr_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            conn.execute("UPDATE ocr_cache_stats SET value = value + 1 WHERE name = 'hits'")
+            return row[0]
+
+    def put(self, key, markdown):
+        """Store OCR text for ``key``"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, markdown, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, markdown, now, now)
+            )
+
+        with self._lock:
+            self._puts += 1
+            should_evict = self._puts % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries and trim the cache down to max_entries"""
+        cutoff = time.time() - self.max_age_seconds
+        with self._connect() as conn:
+            expired = conn.execute("DELETE FROM ocr_cache WHERE created_at < ?", (cutoff,)).rowcount
+            count = conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM ocr_cache WHERE key IN "
+                    "(SELECT key FROM ocr_cache ORDER BY last_used_at LIMIT ?)",
+                    (overflow,)
+                )
+        if expired or overflow > 0:
+            logger.info(f"OCR cache evicted {expired} expired and {max(overflow, 0)} LRU entries")
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries"""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM ocr_cache_stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "max_age_seconds": self.max_age_seconds
+        }
@@ -0,0 +1,291 @@
+import itertools
+import logging
+import random
+import threading
+import time
+
+from ocr_backends import OCRBackendError
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` calls per second with bursts of ``burst``"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and return the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class JobShare:
+    """One job's claim on the OCR call slots: its weight, cap and wait counters"""
+
+    def __init__(self, name, weight=1, max_in_flight=None, priority=None):
+        self.name = name
+        self.weight = weight
+        self.max_in_flight = max_in_flight
+        self.priority = priority
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        # Virtual time the job's next call starts at
+        self.next_start = 0.0
+
+    def describe(self):
+        return {
+            "job": self.name,
+            "priority": self.priority,
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3)
+        }
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts AIMD-style to how the OCR API is coping
+
+    Every success adds ``1 / limit`` (about one slot per round of calls)
+    and a throttle or server error halves the limit, never leaving
+    ``[min_limit, max_limit]``. Failures of calls sent before the last
+    decrease are ignored, so a burst of 429s across every call in flight
+    halves the limit once rather than once per call. Callers block in ``acquire`` while the
+    number of calls in flight is at the current limit.
+
+    Free slots go to waiting calls by weighted fair queuing across the
+    JobShares from ``open_share``. Each call is tagged with a virtual
+    start time, ``1 / weight`` after its job's previous call, and the
+    lowest tag goes next. A job that has just started is therefore
+    served ahead of one that has already used many slots, and a job of
+    weight 4 gets four calls through for every one from a job of weight
+    1. A job never holds more than its ``max_in_flight`` slots.
+    """
+
+    def __init__(self, min_limit=1, max_limit=8, initial=None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._limit = float(initial or max_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._shares = []
+        self._default_share = JobShare(None)
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._decreased_at = None
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def open_share(self, name, weight=1, max_in_flight=None, priority=None):
+        """Register a job and return the JobShare its calls pass to ``acquire``"""
+        share = JobShare(name, weight, max_in_flight, priority)
+        with self._condition:
+            share.next_start = self._virtual_time
+            self._shares.append(share)
+        return share
+
+    def close_share(self, share):
+        with self._condition:
+            if share in self._shares:
+                self._shares.remove(share)
+
+    def _next_call(self):
+        if self._in_flight >= int(self._limit):
+            return None
+        eligible = [call for call in self._waiting
+                    if call[2].max_in_flight is None or call[2].in_flight < call[2].max_in_flight]
+        return min(eligible, default=None)
+
+    def acquire(self, share=None):
+        """Wait for a slot for ``share`` (a JobShare) and return the seconds spent waiting"""
+        share = share or self._default_share
+        started = time.monotonic()
+        with self._condition:
+            start = max(self._virtual_time, share.next_start)
+            share.next_start = start + 1 / share.weight
+            call = (start, next(self._sequence), share)
+            self._waiting.append(call)
+            share.waiting += 1
+            while self._next_call() is not call:
+                self._condition.wait()
+            self._waiting.remove(call)
+            share.waiting -= 1
+            self._virtual_time = start
+            self._in_flight += 1
+            share.in_flight += 1
+
+            waited = time.monotonic() - started
+            share.calls += 1
+            share.wait_seconds += waited
+            share.max_wait_seconds = max(share.max_wait_seconds, waited)
+            if self._waiting:
+                # Another slot may still be free for the call now at the front
+                self._condition.notify_all()
+        return waited
+
+    def release(self, share=None):
+        share = share or self._default_share
+        with self._condition:
+            self._in_flight -= 1
+            share.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            before = int(self._limit)
+            self._limit = min(self.max_limit, self._limit + 1 / max(self._limit, 1))
+            if int(self._limit) > before:
+                self._condition.notify_all()
+
+    def on_overload(self, started=None):
+        """Halve the limit after a call sent at ``started`` (time.monotonic) was throttled"""
+        with self._condition:
+            if started is not None and self._decreased_at is not None and started < self._decreased_at:
+                return
+            self._decreased_at = time.monotonic()
+            self._limit = max(self.min_limit, self._limit / 2)
+            logger.info(f"OCR concurrency reduced to {int(self._limit)}")
+
+    def queue_depth(self):
+        """Calls waiting for a slot, by the priority of their job"""
+        with self._condition:
+            depth = {}
+            for _, _, share in self._waiting:
+                depth[share.priority] = depth.get(share.priority, 0) + 1
+            return depth
+
+    def stats(self):
+        with self._condition:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "jobs": [share.describe() for share in self._shares]
+            }
+
+class OCRCallStats:
+    """Per-job counters of OCR retries and throttling, safe to share across page threads"""
+
+    def __init__(self):
+        self._counts = {"calls": 0, "retries": 0, "throttled": 0, "failed_pages": 0,
+                        "rate_limit_wait_seconds": 0.0, "queue_wait_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def record(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def as_dict(self):
+        with self._lock:
+            counts = dict(self._counts)
+        for name in ("rate_limit_wait_seconds", "queue_wait_seconds"):
+            counts[name] = round(counts[name], 3)
+        return counts
+
+class OCRClient:
+    """Shared front end to an OCR backend used by every job and page thread
+
+    Calls pass through a token bucket sized to the API quota and an
+    adaptive concurrency limit shared fairly between jobs. Retryable
+    failures (429, 5xx, timeouts) are retried with exponential backoff
+    and full jitter, honouring Retry-After when the API sends one; a page
+    only fails once ``max_retries`` retries are used up.
+    """
+
+    def __init__(self, backend, rate_limit=0, burst=None, max_retries=4, base_delay=0.5, max_delay=30.0,
+                 min_concurrency=1, max_concurrency=8):
+        self.backend = backend
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.limiter = AdaptiveLimiter(min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.totals = OCRCallStats()
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def _record(self, stats, name, amount=1):
+        self.totals.record(name, amount)
+        if stats is not None:
+            stats.record(name, amount)
+
+    def _backoff(self, attempt, error):
+        if error.retry_after is not None:
+            return min(self.max_delay, error.retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def ocr_page(self, document, page_num, task_type="default", stats=None, image=None, share=None):
+        """OCR one page, retrying throttled and transient failures
+
+        ``stats`` is an optional OCRCallStats the job's counters go to,
+        ``image`` the pre-rendered page to send instead of the PDF page and
+        ``share`` the job's JobShare of the concurrency limit.
+        """
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire(share)
+            if waited:
+                self._record(stats, "queue_wait_seconds", waited)
+            try:
+                # Take the token once holding a slot, so calls leave at the quota's rate
+                # instead of queueing with tokens in hand and firing together
+                if self.bucket is not None:
+                    waited = self.bucket.acquire()
+                    if waited:
+                        self._record(stats, "rate_limit_wait_seconds", waited)
+                self._record(stats, "calls")
+                started = time.monotonic()
+                markdown = self.backend.ocr_page(document, page_num, task_type, image=image)
+            except OCRBackendError as e:
+                if e.status_code == 429:
+                    self._record(stats, "throttled")
+                if e.retryable:
+                    self.limiter.on_overload(started)
+                if not e.retryable or attempt >= self.max_retries:
+                    self._record(stats, "failed_pages")
+                    raise
+                error = e
+            else:
+                self.limiter.on_success()
+                return markdown
+            finally:
+                self.limiter.release(share)
+
+            delay = self._backoff(attempt, error)
+            attempt += 1
+            self._record(stats, "retries")
+            logger.warning(f"OCR of page {page_num} failed ({error}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def describe(self):
+        """Return backend, limiter and lifetime counters for /health"""
+        return dict(
+            self.backend.describe(),
+            rate_limit=self.bucket.rate if self.bucket else None,
+            max_retries=self.max_retries,
+            concurrency=self.limiter.stats(),
+            totals=self.totals.as_dict()
+        )
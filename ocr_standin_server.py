@@ -0,0 +1,159 @@
+"""Local stand-in for the OCR API, for load testing without paying for OCR
+
+Accepts ``POST /ocr`` with a single-page PDF as the body and returns
+``{"markdown": "..."}`` containing a shipping label whose order ID,
+recipient and address are derived from a hash of the page, so the same
+page always produces the same text. Latency, error rate and a
+requests-per-second limit (answered with 429 and Retry-After) are
+configurable to mimic the real service.
+
+    python ocr_standin_server.py --port 8090 --latency-ms 800 --jitter-ms 300 \
+        --error-rate 0.02 --rate-limit 5
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RECIPIENTS = ["ruhana nui phom", "ชูไวบั๊ะ", "อามีเนาะ ดีอราแม", "กัลยา ป้องแก้ว", "น้องพุด", "สมชาย ใจดี"]
+ADDRESSES = [
+    "58 ม.10 ต.ตลิ่งชัน, บันนังสตา, ยะลา, 95130",
+    "18/1 ม.2 ต.โคกสะตอ อ.รือเสาะ จ.นราธิวาส, 96150",
+    "7/2 ม.1 ต.ศรีบรรพต อ.ศรีสาคร จ.นราธิวาส, 96210",
+    "229 หมู่2 ต.สว่าง, สว่างวีระวงศ์, อุบลราชธานี, 34190",
+    "235/102 ม.3 ซ.ประสมโพธิ ต.สำโรง, พระประแดง, สมุทรปราการ, 10130",
+    "99 ถ.สุขุมวิท แขวงคลองเตย เขตคลองเตย กรุงเทพมหานคร 10110",
+]
+
+def label_for_page(page_bytes):
+    """Deterministic label text for a page"""
+    digest = hashlib.sha256(page_bytes).digest()
+    index = digest[0] % len(RECIPIENTS)
+    order_id = 579199000000000000 + int.from_bytes(digest[1:7], "big") % 10 ** 12
+    return (
+        "TikTok Shop\n\nJ&T EXPRESS\n\n"
+        f"ถึง {RECIPIENTS[index]}\n{ADDRESSES[index]}\n\n"
+        f"Order ID\n{order_id}\n\n"
+        "Shipping Date:\n11/06/2025 23:59\n"
+    )
+
+class TokenBucket:
+    """Allows ``rate`` requests per second with bursts up to ``rate``"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = "OCRStandIn/1.0"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, {"status": "healthy", "stats": self.server.stats})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/ocr":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        config = self.server.config
+        length = int(self.headers.get("Content-Length", 0))
+        page_bytes = self.rfile.read(length)
+        params = parse_qs(urlparse(self.path).query)
+        self.server.count("requests")
+
+        if self.server.bucket and not self.server.bucket.take():
+            self.server.count("rate_limited")
+            self._send_json(429, {"error": "rate limit exceeded"}, {"Retry-After": "1"})
+            return
+
+        latency = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        time.sleep(latency)
+
+        if random.random() < config.error_rate:
+            self.server.count("errors")
+            self._send_json(503, {"error": "simulated upstream failure"})
+            return
+
+        self.server.count("ok")
+        self._send_json(200, {
+            "markdown": label_for_page(page_bytes),
+            "page_num": int(params.get("page_num", ["1"])[0]),
+            "latency_ms": round(latency * 1000, 1),
+        })
+
+    def log_message(self, format, *args):
+        if self.server.config.verbose:
+            super().log_message(format, *args)
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StandInHandler)
+        self.config = config
+        self.bucket = TokenBucket(config.rate_limit) if config.rate_limit else None
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=500, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests per second before 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None, help="seed latency and error sampling")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    config = parse_args(argv)
+    if config.seed is not None:
+        random.seed(config.seed)
+    server = StandInServer((config.host, config.port), config)
+    print(f"OCR stand-in listening on http://{config.host}:{config.port} "
+          f"(latency {config.latency_ms}±{config.jitter_ms} ms, error rate {config.error_rate}, "
+          f"rate limit {config.rate_limit or 'none'}/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
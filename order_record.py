@@ -0,0 +1,64 @@
+ADDRESS_FIELDS = ("street_address", "subdistrict", "district", "province", "postal_code")
+
+class Order:
+    """One order found on a page, held as slots instead of nested dicts
+
+    A job keeps every order it finds until its results are saved, so the
+    record is flat: the resolved address is a tuple of ADDRESS_FIELDS (or
+    None when the label had no recipient) rather than a dict of its own.
+    ``as_dict`` gives the JSON shape the API, result files and exports use.
+    """
+
+    __slots__ = ("page", "slot", "recipient_name", "recipient_address", "address", "order_id",
+                 "shipping_date", "cod", "weight")
+
+    def __init__(self, page, slot, recipient_name, recipient_address, address, order_id, shipping_date, cod, weight):
+        self.page = page
+        self.slot = slot
+        self.recipient_name = recipient_name
+        self.recipient_address = recipient_address
+        self.address = address
+        self.order_id = order_id
+        self.shipping_date = shipping_date
+        self.cod = cod
+        self.weight = weight
+
+    @classmethod
+    def from_shipping_info(cls, page, slot, shipping_info):
+        """Build an order from extract_shipping_info output"""
+        parsed = shipping_info["parsed_address"]
+        return cls(
+            page, slot,
+            shipping_info["recipient_name"],
+            shipping_info["recipient_address"],
+            tuple(parsed.get(field, "") for field in ADDRESS_FIELDS) if parsed else None,
+            shipping_info["order_id"],
+            shipping_info["shipping_date"],
+            shipping_info["cod"],
+            shipping_info["weight"]
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild an order from its ``as_dict`` form"""
+        return cls.from_shipping_info(data["page"], data.get("slot", 1), data)
+
+    def as_dict(self):
+        parsed_address = {}
+        if self.address is not None:
+            parsed_address = dict(zip(ADDRESS_FIELDS, self.address), full_address=self.recipient_address)
+        return {
+            "page": self.page,
+            "slot": self.slot,
+            "recipient_name": self.recipient_name,
+            "recipient_address": self.recipient_address,
+            "parsed_address": parsed_address,
+            "order_id": self.order_id,
+            "shipping_date": self.shipping_date,
+            "cod": self.cod,
+            "weight": self.weight
+        }
+
+def order_dict(order):
+    """An order as a dict, whether it is an Order or already a dict"""
+    return order.as_dict() if isinstance(order, Order) else order
@@ -0,0 +1,221 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    batch_id TEXT,
+    document TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    slot INTEGER NOT NULL DEFAULT 1,
+    recipient_name TEXT NOT NULL,
+    recipient_address TEXT NOT NULL,
+    street_address TEXT NOT NULL,
+    subdistrict TEXT NOT NULL,
+    district TEXT NOT NULL,
+    province TEXT NOT NULL,
+    postal_code TEXT NOT NULL,
+    shipping_date TEXT NOT NULL,
+    shipping_day TEXT NOT NULL,
+    cod TEXT NOT NULL,
+    weight TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_order_id ON orders (order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_job ON orders (job_id, shipping_day, id);
+CREATE INDEX IF NOT EXISTS idx_orders_batch ON orders (batch_id, shipping_day, id);
+CREATE INDEX IF NOT EXISTS idx_orders_document ON orders (document, shipping_day, id);
+CREATE INDEX IF NOT EXISTS idx_orders_postal_code ON orders (postal_code, shipping_day, id);
+CREATE INDEX IF NOT EXISTS idx_orders_province ON orders (province, shipping_day, id);
+CREATE INDEX IF NOT EXISTS idx_orders_day ON orders (shipping_day, id);
+"""
+
+# Columns added to the orders table after its first release
+ORDER_COLUMN_MIGRATIONS = {
+    'slot': 'INTEGER NOT NULL DEFAULT 1'
+}
+
+# Filters accepted by query(), mapped to their column
+EQUALITY_FILTERS = {
+    'order_id': 'order_id',
+    'job_id': 'job_id',
+    'batch_id': 'batch_id',
+    'document': 'document',
+    'province': 'province',
+    'postal_code': 'postal_code',
+}
+
+MAX_PAGE_SIZE = 500
+
+def shipping_day(shipping_date):
+    """Turn a label date like "11/06/2025 23:59" into "2025-06-11", or "" if it can't be read"""
+    try:
+        return datetime.strptime(shipping_date.split()[0], '%d/%m/%Y').date().isoformat()
+    except (ValueError, IndexError, AttributeError):
+        return ''
+
+def encode_cursor(order):
+    return f"{order['shipping_day']}|{order['id']}"
+
+def decode_cursor(cursor):
+    """Split a cursor from query() into ``(shipping_day, id)``; raises ValueError if malformed"""
+    day, _, row_id = cursor.rpartition('|')
+    return day, int(row_id)
+
+class OrderStore:
+    """Indexed SQLite store of every extracted order
+
+    Orders are written once per finished job and looked up by order ID or
+    filtered by document, postcode, province and shipping day. Results
+    come latest shipping day first, and every filter has an index ending
+    in ``(shipping_day, id)``, so a page is one ordered index range scan.
+    Pagination uses a keyset cursor on that pair, so a page costs the same
+    at any depth.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        # Several server processes may open the store at once; only one may alter it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(orders)")}
+            for column, column_type in ORDER_COLUMN_MIGRATIONS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE orders ADD COLUMN {column} {column_type}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def _connect(self):
+        # One long-lived connection per thread, for the reasons given in JobStore._connect
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    def add_orders(self, job_id, document, orders, batch_id=None):
+        """Store a job's orders, replacing any stored by an earlier run of the job"""
+        now = datetime.now().isoformat()
+        rows = []
+        for order in orders:
+            address = order.get('parsed_address') or {}
+            rows.append((
+                order.get('order_id', ''), job_id, batch_id, order.get('document', document), order['page'],
+                order.get('slot', 1), order.get('recipient_name', ''), order.get('recipient_address', ''),
+                address.get('street_address', ''), address.get('subdistrict', ''),
+                address.get('district', ''), address.get('province', ''), address.get('postal_code', ''),
+                order.get('shipping_date', ''), shipping_day(order.get('shipping_date', '')),
+                order.get('cod', ''), order.get('weight', ''), now
+            ))
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM orders WHERE job_id = ?", (job_id,))
+                conn.executemany(
+                    "INSERT INTO orders (order_id, job_id, batch_id, document, page, slot, recipient_name, "
+                    "recipient_address, street_address, subdistrict, district, province, postal_code, "
+                    "shipping_date, shipping_day, cod, weight, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Stored {len(rows)} orders for job {job_id}")
+        return len(rows)
+
+    def query(self, filters=None, date_from=None, date_to=None, limit=50, cursor=None):
+        """Return ``(orders, next_cursor)`` matching the filters, latest shipping day first
+
+        ``filters`` maps EQUALITY_FILTERS names to values; ``date_from`` and
+        ``date_to`` are inclusive ISO dates on the shipping day. Pass the
+        returned ``next_cursor`` back to get the following page; it is None
+        on the last page.
+        """
+        clauses, params = [], []
+        for name, value in (filters or {}).items():
+            clauses.append(f"{EQUALITY_FILTERS[name]} = ?")
+            params.append(value)
+        if date_from:
+            clauses.append("shipping_day >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("shipping_day <= ?")
+            params.append(date_to)
+        if cursor is not None:
+            clauses.append("(shipping_day, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM orders {where} ORDER BY shipping_day DESC, id DESC LIMIT ?", params + [limit + 1]
+            ).fetchall()
+
+        orders = [self._row_to_order(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(orders[-1]) if len(rows) > limit else None
+        return orders, next_cursor
+
+    def get_by_order_id(self, order_id):
+        """Return every stored occurrence of an order ID, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM orders WHERE order_id = ? ORDER BY id DESC", (order_id,)
+            ).fetchall()
+        return [self._row_to_order(row) for row in rows]
+
+    @staticmethod
+    def _row_to_order(row):
+        return {
+            "id": row["id"],
+            "order_id": row["order_id"],
+            "job_id": row["job_id"],
+            "batch_id": row["batch_id"],
+            "document": row["document"],
+            "page": row["page"],
+            "slot": row["slot"],
+            "recipient_name": row["recipient_name"],
+            "recipient_address": row["recipient_address"],
+            "parsed_address": {
+                "street_address": row["street_address"],
+                "subdistrict": row["subdistrict"],
+                "district": row["district"],
+                "province": row["province"],
+                "postal_code": row["postal_code"]
+            },
+            "shipping_date": row["shipping_date"],
+            "shipping_day": row["shipping_day"],
+            "cod": row["cod"],
+            "weight": row["weight"],
+            "created_at": row["created_at"]
+        }
@@ -0,0 +1,175 @@
+import hashlib
+import io
+import logging
+import threading
+from importlib.util import find_spec
+
+logger = logging.getLogger(__name__)
+
+# Rendering needs pypdfium2 and Pillow; without them pages go to OCR as PDFs.
+# Both are only imported once a page is rendered.
+PREPROCESSING_AVAILABLE = find_spec('pypdfium2') is not None and find_spec('PIL') is not None
+
+# Pixels darker than this count as ink when looking for blank pages
+INK_LEVEL = 200
+
+def parse_regions(spec):
+    """Parse ``"left,top,right,bottom;..."`` page fractions into a list of boxes"""
+    regions = []
+    for part in (spec or '').split(';'):
+        if not part.strip():
+            continue
+        box = tuple(float(value) for value in part.split(','))
+        if len(box) != 4 or not all(0 <= value <= 1 for value in box) or box[0] >= box[2] or box[1] >= box[3]:
+            raise ValueError(f"Invalid crop region: {part!r}")
+        regions.append(box)
+    return regions
+
+def dhash(image, size=16):
+    """``size * size``-bit difference hash of a grayscale image"""
+    from PIL import Image
+
+    pixels = list(image.resize((size + 1, size), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return bits
+
+def ink_ratio(image):
+    """Fraction of pixels in a grayscale image darker than INK_LEVEL"""
+    histogram = image.histogram()
+    return sum(histogram[:INK_LEVEL]) / max(1, image.width * image.height)
+
+class PreparedPage:
+    """A page rendered for OCR, with what the pre-OCR stage learned about it"""
+
+    __slots__ = ("page", "image_bytes", "width", "height", "ink_ratio", "phash", "digest", "blank")
+
+    def __init__(self, page, image_bytes, width, height, ink_ratio, phash, digest, blank):
+        self.page = page
+        self.image_bytes = image_bytes
+        self.width = width
+        self.height = height
+        self.ink_ratio = ink_ratio
+        self.phash = phash
+        self.digest = digest
+        self.blank = blank
+
+    def describe(self):
+        return {
+            "page": self.page,
+            "width": self.width,
+            "height": self.height,
+            "bytes": len(self.image_bytes),
+            "ink_ratio": round(self.ink_ratio, 5),
+            "phash": f"{self.phash:064x}",
+            "blank": self.blank
+        }
+
+class PagePreprocessor:
+    """Renders pages once and shrinks them to what OCR needs
+
+    Each page is rendered at ``dpi`` (grayscale by default), cropped to
+    ``regions`` given as page fractions and stacked top to bottom, and
+    encoded as PNG. Pages with less than ``blank_ink_ratio`` dark pixels
+    are flagged blank. A digest of the rendered pixels identifies
+    identical pages and a difference hash near-identical ones.
+    """
+
+    def __init__(self, dpi=150, grayscale=True, regions=None, blank_ink_ratio=0.002):
+        if not PREPROCESSING_AVAILABLE:
+            raise RuntimeError("Page pre-processing needs pypdfium2 and Pillow installed")
+        self.dpi = dpi
+        self.grayscale = grayscale
+        self.regions = regions or []
+        self.blank_ink_ratio = blank_ink_ratio
+
+    def _crop(self, image):
+        if not self.regions:
+            return image
+        crops = [
+            image.crop((round(left * image.width), round(top * image.height),
+                        round(right * image.width), round(bottom * image.height)))
+            for left, top, right, bottom in self.regions
+        ]
+        if len(crops) == 1:
+            return crops[0]
+        from PIL import Image
+
+        stacked = Image.new(image.mode, (max(c.width for c in crops), sum(c.height for c in crops)), 255)
+        y = 0
+        for crop in crops:
+            stacked.paste(crop, (0, y))
+            y += crop.height
+        return stacked
+
+    def prepare(self, document, page_num):
+        """Render, crop and encode one page of an open PDFDocument"""
+        image = document.render_page(page_num, self.dpi, grayscale=self.grayscale)
+        gray = image if image.mode == "L" else image.convert("L")
+        ratio = ink_ratio(gray)
+        phash = dhash(gray)
+        digest = hashlib.sha1(gray.tobytes()).hexdigest()
+        blank = ratio < self.blank_ink_ratio
+
+        page_image = self._crop(image)
+        buffer = io.BytesIO()
+        page_image.save(buffer, format="PNG")
+        return PreparedPage(page_num, buffer.getvalue(), page_image.width, page_image.height,
+                            ratio, phash, digest, blank)
+
+    def describe(self):
+        return {"dpi": self.dpi, "grayscale": self.grayscale, "regions": self.regions,
+                "blank_ink_ratio": self.blank_ink_ratio}
+
+class DuplicatePageFilter:
+    """Tracks pages within one document to spot repeated ones
+
+    With ``max_distance`` 0 only pixel-identical renders match. Otherwise
+    pages whose difference hashes are within ``max_distance`` bits count
+    as the same page; labels share a layout, so keep this small or pages
+    that differ only in their order ID will be merged.
+
+    Pages are decided in page order whatever order their threads get here
+    in: ``first_seen`` waits until every earlier page has been seen or
+    passed over with ``skip``, so the lowest-numbered copy is always the
+    one kept. Every page from ``first_page`` on must reach one of the two.
+    """
+
+    def __init__(self, max_distance=0, first_page=1):
+        self.max_distance = max_distance
+        self._seen = {}
+        self._next_page = first_page
+        self._checked_in = set()
+        self._condition = threading.Condition()
+
+    def _check_in(self, page):
+        self._checked_in.add(page)
+        while self._next_page in self._checked_in:
+            self._checked_in.remove(self._next_page)
+            self._next_page += 1
+        self._condition.notify_all()
+
+    def skip(self, page):
+        """Let later pages past ``page``, which is not being checked; no-op once it has been"""
+        with self._condition:
+            if page >= self._next_page and page not in self._checked_in:
+                self._check_in(page)
+
+    def first_seen(self, prepared):
+        """Return the earlier page ``prepared`` duplicates, or None and remember it"""
+        key = prepared.digest if self.max_distance == 0 else prepared.phash
+        with self._condition:
+            while self._next_page < prepared.page:
+                self._condition.wait()
+            if self.max_distance == 0:
+                match = self._seen.get(key)
+            else:
+                match = next((page for seen, page in self._seen.items()
+                              if bin(seen ^ key).count('1') <= self.max_distance), None)
+            if match is None:
+                self._seen[key] = prepared.page
+            self._check_in(prepared.page)
+            return match
@@ -0,0 +1,106 @@
+import io
+import logging
+import mmap
+import threading
+
+logger = logging.getLogger(__name__)
+
+class PDFDocument:
+    """A PDF parsed once and shared by every stage of the page loop
+
+    The file is memory-mapped where possible so pages are read straight
+    from the page cache instead of being copied into Python memory, and
+    the cross-reference table is parsed a single time. Individual pages
+    are only materialized when a stage asks for them. PyPDF2 readers are
+    not thread-safe, so page access is serialized with a lock; callers can
+    share one document across the OCR worker pool.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._mmap = None
+        self._reader = None
+        self._pdfium = None
+        self._page_count = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_reader(self):
+        if self._reader is None:
+            self._file = open(self.path, 'rb')
+            try:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                stream = self._mmap
+            except (ValueError, OSError):
+                # Empty files and some filesystems can't be mapped
+                stream = self._file
+            import PyPDF2
+
+            self._reader = PyPDF2.PdfReader(stream)
+        return self._reader
+
+    @property
+    def page_count(self):
+        """Total number of pages, or 1 if the PDF cannot be parsed"""
+        if self._page_count is None:
+            with self._lock:
+                try:
+                    self._page_count = len(self._get_reader().pages)
+                except Exception as e:
+                    logger.error(f"Error reading PDF: {e}")
+                    self._page_count = 1
+        return self._page_count
+
+    def page_text(self, page_num):
+        """Return the text layer of a 1-based page, or "" if it has none or can't be read"""
+        with self._lock:
+            try:
+                return self._get_reader().pages[page_num - 1].extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Could not extract text from page {page_num}: {e}")
+                return ""
+
+    def page_bytes(self, page_num):
+        """Return a single page as standalone PDF bytes"""
+        import PyPDF2
+
+        with self._lock:
+            pdf_writer = PyPDF2.PdfWriter()
+            pdf_writer.add_page(self._get_reader().pages[page_num - 1])
+            buffer = io.BytesIO()
+            pdf_writer.write(buffer)
+            return buffer.getvalue()
+
+    def render_page(self, page_num, dpi=150, grayscale=False):
+        """Render a 1-based page to a PIL image (needs pypdfium2 and Pillow)"""
+        import pypdfium2 as pdfium
+
+        with self._lock:
+            if self._pdfium is None:
+                self._pdfium = pdfium.PdfDocument(self.path)
+            page = self._pdfium[page_num - 1]
+            try:
+                bitmap = page.render(scale=dpi / 72, grayscale=grayscale)
+                return bitmap.to_pil()
+            finally:
+                page.close()
+
+    def close(self):
+        """Release the reader, memory map and file handle"""
+        with self._lock:
+            self._reader = None
+            if self._pdfium is not None:
+                self._pdfium.close()
+                self._pdfium = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import threading
+from itertools import islice
+
+from order_record import order_dict
+
+class OrderLog:
+    """JSON Lines file of a job's orders, appended to as each page finishes
+
+    Each line is one order in its ``as_dict`` form, so the orders are
+    encoded once, while the job runs, and pages of them can be read back
+    without loading the rest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, orders):
+        lines = [json.dumps(order_dict(order), ensure_ascii=False) for order in orders]
+        if lines:
+            self._file.write('\n'.join(lines) + '\n')
+            self.count += len(lines)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+def write_summary(path, summary):
+    """Write a results summary (everything but the orders) to ``path``"""
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_summary(path):
+    """Read a summary written by write_summary, or its gzipped copy"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def results_json_chunks(summary, orders_path, chunk_size=65536):
+    """Yield the JSON result document: ``summary`` with the orders in ``orders_path`` as extracted_orders
+
+    The order lines are copied into the array as they are rather than
+    decoded and encoded again, so the document is streamed from the
+    orders file without being held in memory or stored a second time.
+    """
+    head = json.dumps(summary, ensure_ascii=False)
+    chunk = [head[:-1], ', "extracted_orders": [' if summary else '"extracted_orders": [']
+    size = 0
+    with open(orders_path, encoding='utf-8') as lines:
+        first = True
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if not first:
+                chunk.append(', ')
+            chunk.append(line)
+            first = False
+            size += len(line)
+            if size >= chunk_size:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+    chunk.append(']}')
+    yield ''.join(chunk)
+
+def read_orders(path, offset=0, limit=None):
+    """Read up to ``limit`` orders from a JSON Lines file, skipping the first ``offset``"""
+    with open(path, encoding='utf-8') as f:
+        stop = None if limit is None else offset + limit
+        return [json.loads(line) for line in islice(f, offset, stop) if line.strip()]
+
+def iter_orders(path):
+    """Yield the orders in a JSON Lines file one at a time"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,235 @@
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Files younger than this are never touched, so in-flight uploads and exports survive
+MIN_AGE_SECONDS = 60
+# Temporary files (exports being written, compression in progress) are left alone this long
+TMP_GRACE_SECONDS = 3600
+
+class FolderPolicy:
+    """Retention rules for one folder
+
+    Files whose last modification is older than ``max_age_seconds`` are
+    deleted. If the folder still holds more than ``max_bytes``, the least
+    recently used files (by access time, which downloads refresh) go
+    first until it fits. JSON files older than ``compress_after_seconds``
+    are gzipped in place. ``protect`` may return a set of paths that must
+    be kept regardless, such as uploads still waiting to be processed.
+    """
+
+    def __init__(self, name, path, max_age_seconds=None, max_bytes=None, compress_after_seconds=None, protect=None):
+        self.name = name
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.compress_after_seconds = compress_after_seconds
+        self.protect = protect
+
+    def describe(self):
+        return {
+            "path": self.path,
+            "max_age_seconds": self.max_age_seconds,
+            "max_bytes": self.max_bytes,
+            "compress_after_seconds": self.compress_after_seconds
+        }
+
+def _list_files(path):
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = os.path.join(root, name)
+            try:
+                files.append((file_path, os.stat(file_path)))
+            except FileNotFoundError:
+                # Removed between listing and stat
+                continue
+    return files
+
+def _is_busy(path, age):
+    return age < MIN_AGE_SECONDS or ('.tmp' in os.path.basename(path) and age < TMP_GRACE_SECONDS)
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not remove {path}: {e}")
+        return False
+
+def compress_file(path):
+    """Gzip ``path`` to ``path.gz``, keeping its timestamps, and remove the original"""
+    stat = os.stat(path)
+    gz_path = f"{path}.gz"
+    tmp_path = f"{gz_path}.tmp"
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tmp_path, gz_path)
+    os.remove(path)
+    return gz_path
+
+def mark_used(path):
+    """Record that a file was just read, for LRU eviction, without changing its age"""
+    try:
+        stat = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except OSError:
+        pass
+
+class RetentionManager:
+    """Background thread enforcing FolderPolicy rules every ``interval`` seconds
+
+    All directory walking happens on this thread; request handlers only
+    read the usage figures from the last sweep. ``tasks`` maps a name to
+    a ``func(now)`` run on every sweep as well, for data kept outside the
+    folders (such as rows in a store); it returns how many items it
+    deleted, which is added to the task's total.
+    """
+
+    def __init__(self, policies, interval=600, tasks=None):
+        self.policies = policies
+        self.interval = interval
+        self.tasks = tasks or {}
+        self._task_totals = {name: 0 for name in self.tasks}
+        self._stats = {}
+        self._totals = {policy.name: {"deleted": 0, "evicted": 0, "compressed": 0, "freed_bytes": 0}
+                        for policy in policies}
+        self._last_run = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the retention thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+        logger.info(f"Retention manager started, sweeping every {self.interval}s")
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}")
+            time.sleep(self.interval)
+
+    def run_once(self, now=None):
+        """Apply every policy once and return per-folder usage"""
+        now = now or time.time()
+        stats = {}
+        for policy in self.policies:
+            stats[policy.name] = self._apply(policy, now)
+        for name, task in self.tasks.items():
+            try:
+                deleted = task(now)
+            except Exception as e:
+                logger.error(f"Retention task {name} failed: {e}")
+                continue
+            with self._lock:
+                self._task_totals[name] += deleted
+            if deleted:
+                logger.info(f"Retention {name}: deleted {deleted}")
+        with self._lock:
+            self._stats = stats
+            self._last_run = datetime.fromtimestamp(now).isoformat()
+        return stats
+
+    def _apply(self, policy, now):
+        if not os.path.isdir(policy.path):
+            return {"files": 0, "bytes": 0}
+
+        protected = policy.protect() if policy.protect else set()
+        swept = {"deleted": 0, "evicted": 0, "compressed": 0, "freed_bytes": 0}
+        kept = []
+
+        for path, stat in _list_files(policy.path):
+            age = now - stat.st_mtime
+            if path in protected or _is_busy(path, age):
+                kept.append((path, stat))
+                continue
+
+            if policy.max_age_seconds is not None and age > policy.max_age_seconds:
+                if _remove(path):
+                    swept["deleted"] += 1
+                    swept["freed_bytes"] += stat.st_size
+                continue
+
+            if (policy.compress_after_seconds is not None and age > policy.compress_after_seconds
+                    and path.endswith('.json')):
+                try:
+                    gz_path = compress_file(path)
+                    gz_stat = os.stat(gz_path)
+                    swept["compressed"] += 1
+                    swept["freed_bytes"] += stat.st_size - gz_stat.st_size
+                    path, stat = gz_path, gz_stat
+                except OSError as e:
+                    logger.warning(f"Could not compress {path}: {e}")
+
+            kept.append((path, stat))
+
+        used = sum(stat.st_size for _, stat in kept)
+        if policy.max_bytes is not None and used > policy.max_bytes:
+            # Least recently used first; protected and in-flight files are never evicted
+            candidates = sorted(
+                (item for item in kept if item[0] not in protected and not _is_busy(item[0], now - item[1].st_mtime)),
+                key=lambda item: item[1].st_atime
+            )
+            evicted = set()
+            for path, stat in candidates:
+                if used <= policy.max_bytes:
+                    break
+                if _remove(path):
+                    used -= stat.st_size
+                    evicted.add(path)
+                    swept["evicted"] += 1
+                    swept["freed_bytes"] += stat.st_size
+            kept = [item for item in kept if item[0] not in evicted]
+
+        with self._lock:
+            totals = self._totals[policy.name]
+            for name, value in swept.items():
+                totals[name] += value
+        if swept["deleted"] or swept["evicted"] or swept["compressed"]:
+            logger.info(f"Retention {policy.name}: deleted {swept['deleted']}, evicted {swept['evicted']}, "
+                        f"compressed {swept['compressed']}, freed {swept['freed_bytes']} bytes")
+
+        return {
+            "files": len(kept),
+            "bytes": used,
+            "oldest_age_seconds": round(now - min(stat.st_mtime for _, stat in kept)) if kept else 0
+        }
+
+    def stats(self):
+        """Usage from the last sweep, policy limits, lifetime totals and free disk space"""
+        with self._lock:
+            folders = {}
+            for policy in self.policies:
+                folders[policy.name] = dict(
+                    policy.describe(),
+                    **self._stats.get(policy.name, {}),
+                    totals=dict(self._totals[policy.name])
+                )
+            last_run = self._last_run
+            tasks = {name: {"deleted": total} for name, total in self._task_totals.items()}
+
+        disks = {}
+        for policy in self.policies:
+            try:
+                usage = shutil.disk_usage(policy.path)
+            except OSError:
+                continue
+            disks[policy.name] = {"total_bytes": usage.total, "used_bytes": usage.used, "free_bytes": usage.free}
+
+        return {"interval_seconds": self.interval, "last_run": last_run, "folders": folders, "tasks": tasks,
+                "disk": disks}
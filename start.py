@@ -1,31 +1,87 @@
 import os
 import sys
+import signal
 import subprocess
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds to wait before restarting a worker process that exited
+WORKER_RESTART_DELAY = 5
+
+def web_workers():
+    """Gunicorn worker processes: WEB_WORKERS, or sized from the CPU count"""
+    if os.environ.get('WEB_WORKERS'):
+        return max(1, int(os.environ['WEB_WORKERS']))
+    # Web workers only serve requests and SQLite reads, so the usual 2 x CPUs + 1, kept modest for memory
+    return min(2 * (os.cpu_count() or 1) + 1, 8)
+
+def start_worker():
+    print("Starting background worker process")
+    return subprocess.Popen([sys.executable, os.path.join(APP_DIR, 'worker.py')])
 
 def main():
     # Get port from environment variable, default to 8080
     port = os.environ.get('PORT', '8080')
-    
-    print(f"Starting application on port {port}")
-    
+    workers = web_workers()
+
+    print(f"Starting application on port {port} with {workers} web workers")
+
     # Build gunicorn command
     cmd = [
         'gunicorn',
         '--bind', f'0.0.0.0:{port}',
-        'app:app',
+        '--pythonpath', APP_DIR,
+        'app:create_app()',
         '--timeout', '300',
-        '--workers', '1',
+        '--workers', str(workers),
+        # Threaded worker so long-lived /jobs/<id>/events streams don't block other requests
+        '--worker-class', 'gthread',
+        '--threads', os.environ.get('WEB_THREADS', '8'),
         '--log-level', 'info',
         '--access-logfile', '-',
         '--error-logfile', '-'
     ]
-    
-    # Execute gunicorn
+
+    # OCR jobs run in worker.py; the web processes only queue them and serve state from the shared stores
+    processes = {'worker': start_worker()}
     try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
+        processes['web'] = subprocess.Popen(cmd, env=dict(os.environ, RUN_BACKGROUND_WORKERS='false'))
+    except OSError as e:
         print(f"Error starting gunicorn: {e}")
+        processes['worker'].terminate()
+        sys.exit(1)
+
+    stopping = threading.Event()
+
+    def shutdown(signum, frame):
+        stopping.set()
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Keep the worker alive for as long as gunicorn runs; exit when gunicorn does
+    while processes['web'].poll() is None:
+        if processes['worker'].poll() is not None and not stopping.is_set():
+            print(f"Worker process exited with code {processes['worker'].returncode}; restarting")
+            time.sleep(WORKER_RESTART_DELAY)
+            if processes['web'].poll() is None and not stopping.is_set():
+                processes['worker'] = start_worker()
+        time.sleep(1)
+
+    shutdown(None, None)
+    try:
+        processes['worker'].wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processes['worker'].kill()
+
+    if processes['web'].returncode:
+        print(f"Error: gunicorn exited with code {processes['web'].returncode}")
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,325 @@
+import csv
+import difflib
+import logging
+import os
+import re
+import threading
+
+from label_parser import POSTAL_CODE_RE, parse_address
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'resources', 'thai_gazetteer.tsv'
+)
+
+# Common ways a province is written on labels that aren't its official name
+PROVINCE_ALIASES = {
+    'กรุงเทพ': 'กรุงเทพมหานคร',
+    'กรุงเทพฯ': 'กรุงเทพมหานคร',
+    'กทม': 'กรุงเทพมหานคร',
+    'กทม.': 'กรุงเทพมหานคร',
+    'อยุธยา': 'พระนครศรีอยุธยา',
+}
+
+# Abbreviated and full administrative prefixes; แขวง/เขต are Bangkok's equivalents
+SUBDISTRICT_MARKER_RE = re.compile(r'(?:ต\.|ตำบล|แขวง)\s*([^\s,]+)')
+DISTRICT_MARKER_RE = re.compile(r'(?:อ\.|อำเภอ|เขต)\s*([^\s,]+)')
+PROVINCE_MARKER_RE = re.compile(r'(?:จ\.|จังหวัด)\s*([^\s,]+)')
+PROVINCE_MARKER_PREFIX_RE = re.compile(r'^(?:จ\.|จังหวัด)')
+PROVINCE_MARKER_SUFFIX_RE = re.compile(r'(?:จ\.|จังหวัด)$')
+ANY_MARKER_RE = re.compile(r'(?:ต\.|ตำบล|แขวง|อ\.|อำเภอ|เขต|จ\.|จังหวัด)')
+SPACE_RE = re.compile(r'\s+')
+
+FUZZY_CUTOFF = 0.7
+
+def _alternation(names):
+    # Longest first so e.g. สว่างวีระวงศ์ wins over สว่าง
+    return re.compile('|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)))
+
+class ThaiGazetteer:
+    """In-memory index of Thai postcodes, provinces, districts and subdistricts
+
+    Loaded once from a TSV with ``postal_code, province, district,
+    subdistrict`` columns. Lookups go through dicts keyed by postcode and
+    by province/district, and name searches use one compiled alternation
+    per province (built lazily), so resolving an address costs a few
+    regex scans rather than a walk over the whole table.
+    """
+
+    def __init__(self, rows):
+        self.by_postcode = {}
+        self.provinces_by_prefix = {}
+        self.districts = {}
+        self.subdistricts = {}
+        self.district_postcodes = {}
+
+        for postal_code, province, district, subdistrict in rows:
+            self.by_postcode.setdefault(postal_code, []).append((province, district, subdistrict))
+            self.provinces_by_prefix.setdefault(postal_code[:2], set()).add(province)
+            if district:
+                self.districts.setdefault(province, set()).add(district)
+                self.district_postcodes.setdefault((province, district), set()).add(postal_code)
+            if subdistrict:
+                self.subdistricts.setdefault((province, district), set()).add(subdistrict)
+            else:
+                self.subdistricts.setdefault((province, district), set())
+
+        self.provinces = set(self.districts) | {p for ps in self.provinces_by_prefix.values() for p in ps}
+        self.district_provinces = {}
+        for province, names in self.districts.items():
+            for name in names:
+                self.district_provinces.setdefault(name, set()).add(province)
+        self._all_districts_re = _alternation(self.district_provinces) if self.district_provinces else None
+        self._province_names = {name: name for name in self.provinces}
+        self._province_names.update(
+            {alias: name for alias, name in PROVINCE_ALIASES.items() if name in self.provinces}
+        )
+        self._province_re = _alternation(self._province_names)
+        self._district_res = {}
+        self._subdistrict_res = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_GAZETTEER_PATH):
+        """Load a gazetteer from a TSV file"""
+        with open(path, encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+            rows = [
+                (row['postal_code'].strip(), row['province'].strip(),
+                 (row.get('district') or '').strip(), (row.get('subdistrict') or '').strip())
+                for row in reader
+            ]
+        logger.info(f"Loaded Thai gazetteer with {len(rows)} rows from {path}")
+        return cls(rows)
+
+    def _cached_re(self, cache, key, names):
+        pattern = cache.get(key)
+        if pattern is None:
+            pattern = _alternation(names) if names else None
+            with self._lock:
+                cache[key] = pattern
+        return pattern
+
+    def find_provinces(self, text):
+        """Return ``(official name, start)`` for each province mentioned in ``text``, in order"""
+        return [(self._province_names[m.group()], m.start()) for m in self._province_re.finditer(text)]
+
+    def province_named(self, text):
+        """Official name of the province ``text`` is exactly (or an alias of), else None"""
+        return self._province_names.get(text)
+
+    def find_any_districts(self, text):
+        """Return ``(district, provinces)`` for district names of any province in ``text``"""
+        if self._all_districts_re is None:
+            return []
+        return [(m.group(), self.district_provinces[m.group()]) for m in self._all_districts_re.finditer(text)]
+
+    def find_districts(self, province, text):
+        """Return ``(district, start)`` for each of ``province``'s districts mentioned in ``text``"""
+        names = self.districts.get(province, set())
+        pattern = self._cached_re(self._district_res, province, names)
+        return [(m.group(), m.start()) for m in pattern.finditer(text)] if pattern else []
+
+    def find_subdistricts(self, province, district, text):
+        """Return ``(subdistrict, start)`` for each of the district's subdistricts mentioned in ``text``"""
+        names = self.subdistricts.get((province, district), set())
+        pattern = self._cached_re(self._subdistrict_res, (province, district), names)
+        return [(m.group(), m.start()) for m in pattern.finditer(text)] if pattern else []
+
+    def provinces_for_postcode(self, postal_code):
+        rows = self.by_postcode.get(postal_code)
+        if rows:
+            return {province for province, _, _ in rows}
+        return self.provinces_by_prefix.get(postal_code[:2], set())
+
+    def districts_for_postcode(self, province, postal_code):
+        return {d for p, d, _ in self.by_postcode.get(postal_code, []) if p == province and d}
+
+def _fuzzy(candidates, names):
+    """Return the best fuzzy match of any candidate token against ``names``"""
+    best, best_score = '', FUZZY_CUTOFF
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    for candidate in candidates:
+        if not candidate:
+            continue
+        # seq2 is the one SequenceMatcher indexes, so set it once per candidate
+        matcher.set_seq2(candidate)
+        for name in names:
+            # A name merely containing the token (or contained in it) is a different
+            # name, not a misspelling: มหาสารคาม must not become เมืองมหาสารคาม
+            if name != candidate and (candidate in name or name in candidate):
+                continue
+            matcher.set_seq1(name)
+            # Cheap upper bounds first; most names are rejected without ratio()
+            if matcher.real_quick_ratio() > best_score and matcher.quick_ratio() > best_score:
+                score = matcher.ratio()
+                if score > best_score:
+                    best, best_score = name, score
+    return best
+
+def _is_province_token(gazetteer, token, province):
+    """Whether a comma part is just ``province``, with or without จ. and the postcode"""
+    token = POSTAL_CODE_RE.sub('', PROVINCE_MARKER_PREFIX_RE.sub('', token))
+    return not token or gazetteer.province_named(token) == province
+
+def _pick(mentions, preferred):
+    """First ``(name, start)`` mention whose name is in ``preferred`` if any, else the first mention"""
+    for mention in mentions:
+        if mention[0] in preferred:
+            return mention
+    return mentions[0] if mentions else ('', None)
+
+def _pick_province(gazetteer, compact, postcode_provinces):
+    """The ``(province, start)`` mention that names the address's province, or ``('', None)``
+
+    Roads and villages are often named after provinces (ถ.ตากสิน), so the
+    first mention is not trusted: among mentions consistent with the
+    postcode, one written after จ./จังหวัด wins, then one whose province
+    has a district mentioned in the address, then the last one, since the
+    province is written at the end.
+    """
+    mentions = gazetteer.find_provinces(compact)
+    mentions = [m for m in mentions if m[0] in postcode_provinces] or mentions
+    if len(mentions) <= 1:
+        return mentions[0] if mentions else ('', None)
+    marked = [m for m in mentions if PROVINCE_MARKER_SUFFIX_RE.search(compact[:m[1]])]
+    if marked:
+        return marked[-1]
+    district_provinces = set()
+    for _, provinces in gazetteer.find_any_districts(compact):
+        district_provinces |= provinces
+    consistent = [m for m in mentions if m[0] in district_provinces]
+    return consistent[-1] if consistent else mentions[-1]
+
+def _raw_index(raw_address, compact_index):
+    """Index in ``raw_address`` of the character at ``compact_index`` once whitespace is removed"""
+    for space in SPACE_RE.finditer(raw_address):
+        if space.start() > compact_index:
+            break
+        compact_index += space.end() - space.start()
+    return compact_index
+
+def _marker_text(pattern, raw_address):
+    match = pattern.search(raw_address)
+    return match.group(1) if match else ''
+
+def resolve_address(raw_address, gazetteer=None):
+    """Resolve a raw OCR address into subdistrict, district, province and postcode
+
+    Names are found by exact lookups against the gazetteer regardless of
+    commas, so glued text like "อ.รือเสาะนราธิวาส" still resolves; when a
+    name is misspelled the postcode and fuzzy matching of the text after
+    ต./อ./จ. markers fill the gap. A subdistrict or district the gazetteer
+    can't resolve keeps the text after its marker (or, for the district,
+    the second comma part) as written. Falls back to splitting on commas
+    when no province can be identified.
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    fallback = parse_address(raw_address)
+    postal_code = fallback["postal_code"]
+    compact = SPACE_RE.sub('', raw_address)
+    comma_parts = [SPACE_RE.sub('', part) for part in raw_address.split(',') if part.strip()]
+
+    # Where each resolved name is written in compact, when it is
+    mention_starts = []
+
+    postcode_provinces = gazetteer.provinces_for_postcode(postal_code) if postal_code else set()
+    province, start = _pick_province(gazetteer, compact, postcode_provinces)
+    mention_starts.append(start)
+    if not province:
+        if len(postcode_provinces) == 1:
+            province = next(iter(postcode_provinces))
+        else:
+            # A district name that exists in only one province also identifies it
+            for _, provinces in gazetteer.find_any_districts(compact):
+                if len(provinces) == 1 and (not postcode_provinces or provinces <= postcode_provinces):
+                    province = next(iter(provinces))
+                    break
+        if not province:
+            # Provinces are written after จ. or last, so only those tokens are fuzzy matched
+            markers = PROVINCE_MARKER_RE.findall(raw_address)
+            province = _fuzzy(markers + comma_parts[-2:], postcode_provinces or gazetteer.provinces)
+
+    if not province:
+        return dict(fallback, subdistrict="")
+
+    # District
+    postcode_districts = gazetteer.districts_for_postcode(province, postal_code) if postal_code else set()
+    district, start = _pick(gazetteer.find_districts(province, compact), postcode_districts)
+    mention_starts.append(start)
+    if not district:
+        if len(postcode_districts) == 1:
+            district = next(iter(postcode_districts))
+        elif 'อ.เมือง' in compact or 'อำเภอเมือง' in compact or 'เขตเมือง' in compact:
+            mueang = f"เมือง{province}"
+            district = mueang if mueang in gazetteer.districts.get(province, ()) else ''
+        if not district:
+            markers = DISTRICT_MARKER_RE.findall(raw_address)
+            names = postcode_districts or gazetteer.districts.get(province, set())
+            # The province's own token would fuzzy match เมือง<province>
+            candidates = [part for part in comma_parts if not _is_province_token(gazetteer, part, province)]
+            district = _fuzzy(markers + candidates, names)
+
+    # Subdistrict
+    subdistrict = ''
+    if district:
+        subdistrict_names = gazetteer.subdistricts.get((province, district), set())
+        markers = SUBDISTRICT_MARKER_RE.findall(raw_address)
+        # The text right after ต./ตำบล/แขวง is the strongest signal, even misspelled
+        subdistrict = next((m for m in markers if m in subdistrict_names), '')
+        if not subdistrict and subdistrict_names:
+            subdistrict = _fuzzy(markers, subdistrict_names)
+        if not subdistrict:
+            # Skip the district's own name, which is often also a subdistrict name
+            mentions = [m for m in gazetteer.find_subdistricts(province, district, compact) if m[0] != district]
+            if mentions:
+                subdistrict, start = mentions[0]
+                mention_starts.append(start)
+
+    # A district with a single postcode fills in a missing one
+    if not postal_code and district:
+        postcodes = gazetteer.district_postcodes.get((province, district), set())
+        if len(postcodes) == 1:
+            postal_code = next(iter(postcodes))
+    
+    # Names missing from the gazetteer are kept as written rather than dropped
+    if not subdistrict:
+        subdistrict = _marker_text(SUBDISTRICT_MARKER_RE, raw_address)
+    if not district:
+        district = _marker_text(DISTRICT_MARKER_RE, raw_address)
+        if not district and fallback["district"] and not _is_province_token(
+                gazetteer, SPACE_RE.sub('', fallback["district"]), province):
+            district = fallback["district"]
+
+    # Street address is everything before the first administrative marker or resolved mention
+    cut_points = [_raw_index(raw_address, start) for start in mention_starts if start is not None]
+    marker = ANY_MARKER_RE.search(raw_address)
+    if marker:
+        cut_points.append(marker.start())
+    street_address = raw_address[:min(cut_points)] if cut_points else fallback["street_address"]
+
+    return {
+        "full_address": raw_address,
+        "street_address": street_address.strip(' ,'),
+        "subdistrict": subdistrict,
+        "district": district,
+        "province": province,
+        "postal_code": postal_code
+    }
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Return the process-wide gazetteer, loading it on first use
+
+    Set THAI_GAZETTEER_PATH to use a complete national dataset in the same
+    TSV format instead of the bundled one.
+    """
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = ThaiGazetteer.load(os.environ.get('THAI_GAZETTEER_PATH', DEFAULT_GAZETTEER_PATH))
+    return _gazetteer
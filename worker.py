@@ -0,0 +1,56 @@
+"""Background worker process for production serving
+
+Runs the job workers (and so every OCR call) and the retention sweeper
+in one process, apart from the gunicorn web workers, so long documents
+never hold up request handling. Job state, the OCR cache, orders and
+result files are shared with the web processes through the SQLite
+stores and folders they already use. Every WORKER_STATUS_INTERVAL
+seconds the worker publishes its status (for /health) and metrics (for
+/metrics/worker) to files in the data folder.
+
+    python worker.py
+"""
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import app
+from metrics import REGISTRY
+
+logger = logging.getLogger('worker')
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def publish_status():
+    status = dict(app.background_status(), updated_at=time.time())
+    write_atomic(app.WORKER_STATUS_PATH, json.dumps(status, ensure_ascii=False))
+    write_atomic(app.WORKER_METRICS_PATH, REGISTRY.render())
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    app.create_app()
+    app.start_background_workers()
+    logger.info(f"Worker process {os.getpid()} running {app.JOB_WORKERS} job worker(s)")
+
+    while not stop.is_set():
+        try:
+            publish_status()
+        except Exception as e:
+            logger.error(f"Failed to publish worker status: {e}")
+        stop.wait(app.WORKER_STATUS_INTERVAL)
+
+    # Jobs still running are left in the store as running
+    logger.info("Worker process stopping")
+
+if __name__ == '__main__':
+    main()